@@ -1,26 +1,38 @@
 import sys
 
-import gradio
-import uvicorn
-from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
 from loguru import logger
 from engine_utils.directory_info import DirectoryInfo
 from service.service_utils.logger_utils import config_loggers
 from service.service_utils.service_config_loader import load_configs
 from service.service_utils.ssl_helpers import create_ssl_context
 
+# 项目根目录仅用于 src.xxx 形式的导入，追加到末尾，避免其他导入都先在项目根目录中查找
 project_dir = DirectoryInfo.get_project_dir()
 if project_dir not in sys.path:
-    sys.path.insert(0, project_dir)
+    sys.path.append(project_dir)
 
 
 import argparse
+import functools
 import os
 
-import gradio as gr
 
-from chat_engine.chat_engine import ChatEngine
+_GRADIO_CSS = """
+.app {
+    @media screen and (max-width: 768px) {
+        padding: 8px !important;
+    }
+}
+footer {
+    display: none !important;
+}
+"""
+
+_EMPTY_ASSET_PATHS = (
+    "/ui/static/fonts/system-ui/system-ui-Regular.woff2",
+    "/ui/static/fonts/ui-sans-serif/ui-sans-serif-Regular.woff2",
+    "/favicon.ico",
+)
 
 
 def parse_args():
@@ -37,42 +49,32 @@ def parse_args():
     return parser.parse_args()
 
 
+@functools.lru_cache(maxsize=1)
 def setup_demo(mount_path):
     """
     设置演示应用，创建 FastAPI 应用和 Gradio 界面
     """
+    # gradio 和 fastapi 导入开销很大，仅在真正创建应用时导入
+    import gradio as gr
+    from fastapi import FastAPI, Response
+
     app = FastAPI()
     app.state.mount_path = mount_path
     #@app.get("/")
     #def get_root():
     #    return RedirectResponse(url="/ui")
 
-    @app.get("/ui/static/fonts/system-ui/system-ui-Regular.woff2")
-    @app.get("/ui/static/fonts/ui-sans-serif/ui-sans-serif-Regular.woff2")
-    @app.get("/favicon.ico")
-    def get_font():
-        # remove confusing error
-        return {}
-
-    css = """
-
-
-    .app {
-        @media screen and (max-width: 768px) {
-            padding: 8px !important;
-        }
-    }
-    footer {
-        display: none !important;
-    }
-    """
+    # remove confusing error, answer missing static assets with a prebuilt empty response
+    empty_response = Response(status_code=204)
+    for asset_path in _EMPTY_ASSET_PATHS:
+        app.add_api_route(asset_path, lambda: empty_response, methods=["GET"], include_in_schema=False)
 
     # 创建 Gradio 界面 用于前端的音视频输入
-    with gr.Blocks(css=css) as gradio_block:
+    with gr.Blocks(css=_GRADIO_CSS) as gradio_block:
         with gr.Column():
             with gr.Group() as rtc_container:
                 pass
-    gradio.mount_gradio_app(
+    gr.mount_gradio_app(
         app=app,
         blocks=gradio_block,
         path=mount_path,  # FastAPI 中的路由路径
@@ -97,20 +99,27 @@ def main():
     logger.info(f"args.port2: {args.port}")
     # 设置modelscope的默认下载地址
     # 设置模型缓存路径
+    # modelscope 在缓存目录下的 models 子目录中存放模型，因此只去掉 model_root 末尾的 models 目录
+    # 用户已设置 MODELSCOPE_CACHE 时保持不变
     if not os.path.isabs(engine_config.model_root):
-        os.environ['MODELSCOPE_CACHE'] = os.path.join(DirectoryInfo.get_project_dir(),
-                                                      engine_config.model_root.replace('models', ''))
+        model_root = os.path.normpath(engine_config.model_root)
+        if os.path.basename(model_root) == 'models':
+            model_root = os.path.dirname(model_root)
+        os.environ.setdefault('MODELSCOPE_CACHE', os.path.join(project_dir, model_root))
 
     config_loggers(logger_config)
-    # 创建聊天引擎
-    chat_engine = ChatEngine()
     # 设置演示应用，获取 FastAPI 应用、Gradio 界面和 RTC 容器
     demo_app, ui, parent_block = setup_demo(args.path)
+    # 创建聊天引擎，延迟导入以避免在解析参数阶段加载整个引擎及其依赖
+    from chat_engine.chat_engine import ChatEngine
+    chat_engine = ChatEngine()
     # 初始化聊天引擎，传入配置和应用信息
     chat_engine.initialize(engine_config, app=demo_app, ui=ui, parent_block=parent_block)
 
     ssl_context = create_ssl_context(args, service_config)
+
     # 启动 FastAPI 服务
+    import uvicorn
     uvicorn.run(demo_app, host=service_config.host, port=args.port, **ssl_context)
 
 
@@ -55,7 +55,7 @@ class ImageUtils:
     
     # 注意rgb顺序
     @staticmethod
-    def numpy2base64(video_frame, format="JPEG"):
+    def encode_jpeg_bytes(video_frame, format="JPEG") -> bytes:
         # if video_frame.dtype != np.uint8:
         #     video_frame = (video_frame * 255).astype(np.uint8)
 
@@ -65,11 +65,15 @@ class ImageUtils:
         # 创建一个内存缓冲区
         buffered = BytesIO()
 
-        # 将图像保存到内存缓冲区中
+        # 将图像保存到内存缓冲区中，直接返回编码后的二进制数据，不经过 Base64
         image.save(buffered, format=format)
+        return buffered.getvalue()
 
+    # 注意rgb顺序
+    @staticmethod
+    def numpy2base64(video_frame, format="JPEG"):
         # 获取二进制数据并编码为 Base64
-        base64_image = base64.b64encode(buffered.getvalue()).decode("utf-8")
+        base64_image = base64.b64encode(ImageUtils.encode_jpeg_bytes(video_frame, format)).decode("utf-8")
 
         # 添加 Base64 数据头（可选）
         data_url = f"data:image/{format.lower()};base64,{base64_image}"
@@ -1,7 +1,15 @@
+import threading
+
+
 class SingletonMeta(type):
     __instance = None
+    # RLock: a singleton may create another singleton in its __init__
+    __lock = threading.RLock()
 
     def __call__(cls, *args, **kwargs):
         if not cls.__instance:
-            cls.__instance = type.__call__(cls, *args, **kwargs)
+            with cls.__lock:
+                # double-checked, another thread may have created it while we waited
+                if not cls.__instance:
+                    cls.__instance = type.__call__(cls, *args, **kwargs)
         return cls.__instance
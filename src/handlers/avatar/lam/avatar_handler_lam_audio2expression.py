@@ -1,6 +1,8 @@
+import contextlib
 import os
 import queue
 import sys
+import threading
 import time
 from typing import Dict, Optional, cast, List
 
@@ -24,6 +26,12 @@ class AvatarLAMConfig(HandlerBaseConfigModel, BaseModel):
     model_name: str = "LAM_audio2exp"
     feature_extractor_model_name: str = "wav2vec2-base-960h"
     audio_sample_rate: int = Field(default=24000)
+    # build the model and load its checkpoints on first inference instead of on handler load
+    lazy_load: bool = Field(default=True)
+    # run inference under float16 autocast on cuda
+    enable_amp: bool = Field(default=False)
+    # compile the model with torch.compile(mode="reduce-overhead"), the warmup run captures the graph
+    compile_model: bool = Field(default=False)
 
 
 class AvatarLAMContext(HandlerContext):
@@ -39,6 +47,11 @@ class HandlerAvatarLAM(HandlerBase):
     def __init__(self):
         super().__init__()
         self.infer = None
+        self.infer_config = None
+        self.infer_lock = threading.Lock()
+        self.warmup_sample_rate: Optional[int] = None
+        self.enable_amp = False
+        self.compile_model = False
         self.arkit_channels: List[str] = []
 
     def get_handler_info(self) -> HandlerBaseInfo:
@@ -56,7 +69,6 @@ class HandlerAvatarLAM(HandlerBase):
             default_config_parser,
             default_setup,
         )
-        from .LAM_Audio2Expression.engines.infer import INFER
         project_dir = DirectoryInfo.get_project_dir()
         model_path = os.path.join(project_dir, engine_config.model_root, handler_config.model_name)
         wav2vec_path = os.path.join(project_dir, engine_config.model_root, handler_config.feature_extractor_model_name)
@@ -80,24 +92,52 @@ class HandlerAvatarLAM(HandlerBase):
                 }
             }
         })
-        cfg = default_setup(cfg)
-        self.infer = INFER.build(dict(type=cfg.infer.type, cfg=cfg))
-        self.infer.model.eval()
+        self.infer_config = default_setup(cfg)
+        self.warmup_sample_rate = handler_config.audio_sample_rate
+        self.enable_amp = handler_config.enable_amp
+        self.compile_model = handler_config.compile_model
         arkit_channel_list_path = os.path.join(self.handler_root, "assets", "arkit_face_channels.txt")
         self.arkit_channels.clear()
         for line in open(arkit_channel_list_path, "r"):
             self.arkit_channels.append(line.strip())
 
-        t_start = time.monotonic()
-        # warmup the model
-        context: Optional[Dict] = None
-        self.infer.infer_streaming_audio(
-            context=context,
-            audio=np.zeros([handler_config.audio_sample_rate], dtype=np.float32),
-            ssr=handler_config.audio_sample_rate,
-        )
-        dur_warmup = time.monotonic() - t_start
-        logger.info(f"LAM_Audio2Expression warmup finished in {dur_warmup * 1000} milliseconds.")
+        if not handler_config.lazy_load:
+            self.get_infer()
+
+    def get_infer(self):
+        if self.infer is not None:
+            return self.infer
+        with self.infer_lock:
+            if self.infer is not None:
+                return self.infer
+            from .LAM_Audio2Expression.engines.infer import INFER
+            infer = INFER.build(dict(type=self.infer_config.infer.type, cfg=self.infer_config))
+            infer.model.eval()
+            if self.compile_model:
+                import torch
+                infer.model = torch.compile(infer.model, mode="reduce-overhead", fullgraph=False, dynamic=False)
+
+            t_start = time.monotonic()
+            # warmup the model
+            context: Optional[Dict] = None
+            with self.inference_autocast():
+                infer.infer_streaming_audio(
+                    context=context,
+                    audio=np.zeros([self.warmup_sample_rate], dtype=np.float32),
+                    ssr=self.warmup_sample_rate,
+                )
+            dur_warmup = time.monotonic() - t_start
+            logger.info(f"LAM_Audio2Expression warmup finished in {dur_warmup * 1000} milliseconds.")
+            self.infer = infer
+        return self.infer
+
+    def inference_autocast(self):
+        if not self.enable_amp:
+            return contextlib.nullcontext()
+        import torch
+        if not torch.cuda.is_available():
+            return contextlib.nullcontext()
+        return torch.autocast(device_type="cuda", dtype=torch.float16)
 
     def create_context(self, session_context: SessionContext,
                        handler_config: Optional[HandlerBaseConfigModel] = None) -> HandlerContext:
@@ -166,14 +206,16 @@ class HandlerAvatarLAM(HandlerBase):
                 audio_segments.put_nowait(end_segment)
         if audio_segments.empty() and speech_end:
             audio_segments.put_nowait(np.zeros([50], dtype=np.float32))
+        infer = self.get_infer()
         while not audio_segments.empty():
             t_start = time.monotonic()
             audio_segment = audio_segments.get_nowait()
-            result, context_update = self.infer.infer_streaming_audio(
-                audio=audio_segment,
-                ssr=context.config.audio_sample_rate,
-                context=context.inference_context,
-            )
+            with self.inference_autocast():
+                result, context_update = infer.infer_streaming_audio(
+                    audio=audio_segment,
+                    ssr=context.config.audio_sample_rate,
+                    context=context.inference_context,
+                )
             context.inference_context = context_update
             need_flush = speech_end and audio_segments.empty()
             if need_flush:
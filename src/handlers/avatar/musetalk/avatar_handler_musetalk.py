@@ -264,7 +264,14 @@ class HandlerAvatarMusetalk(HandlerBase):
             unet_config=unet_config,
             whisper_dir=whisper_dir,
             gpu_id=0,
-            debug=handler_config.debug
+            debug=handler_config.debug,
+            compile_models=handler_config.compile_models,
+            lanczos_resize=handler_config.lanczos_resize,
+            use_trt=handler_config.use_trt,
+            whisper_int8=handler_config.whisper_int8,
+            gpu_blend=handler_config.gpu_blend,
+            vae_slice=handler_config.vae_slice,
+            precision=handler_config.precision
         )
         self.processor = AvatarMuseTalkProcessor(
             self.avatar,
@@ -3,11 +3,11 @@ import torch
 import numpy as np
 import cv2
 from typing import Optional, Tuple, List
+from concurrent.futures import ThreadPoolExecutor
 import queue
 import threading
 import time
 from tqdm import tqdm
-import copy
 import sys
 from transformers import WhisperModel
 import argparse
@@ -16,8 +16,13 @@ import json
 import pickle
 import glob
 import builtins
+import collections
+import functools
+import multiprocessing
+import subprocess
 from pydantic import BaseModel
-import librosa
+import soundfile
+import soxr
 from loguru import logger
 
 # Add MuseTalk module path
@@ -36,12 +41,15 @@ from handlers.avatar.musetalk.musetalk_utils_preprocessing import get_landmark_a
 
 # Now you can correctly import MuseTalk modules
 from musetalk.utils.face_parsing import FaceParsing
-from musetalk.utils.utils import datagen, load_all_model
+from musetalk.utils.utils import load_all_model
 from musetalk.utils.blending import get_image_prepare_material, get_image_blending
 from musetalk.utils.audio_processor import AudioProcessor
 
 builtins.input = lambda prompt='': "y"
 
+# Intermediate PNG dumps are lossless either way, level 1 keeps zlib deflate cheap
+PNG_WRITE_PARAMS = [cv2.IMWRITE_PNG_COMPRESSION, 1]
+
 def video2imgs(vid_path, save_path, ext='.png', cut_frame=10000000):
     cap = cv2.VideoCapture(vid_path)
     count = 0
@@ -50,16 +58,91 @@ def video2imgs(vid_path, save_path, ext='.png', cut_frame=10000000):
             break
         ret, frame = cap.read()
         if ret:
-            cv2.imwrite(f"{save_path}/{count:08d}.png", frame)
+            cv2.imwrite(f"{save_path}/{count:08d}.png", frame, PNG_WRITE_PARAMS)
             count += 1
         else:
             break
 
+@functools.lru_cache(maxsize=1)
+def _has_nvenc() -> bool:
+    """Whether h264_nvenc actually works here (probed once)
+
+    Many ffmpeg builds list h264_nvenc without an NVIDIA driver or GPU present,
+    so encode one tiny frame instead of just checking `ffmpeg -encoders`.
+    """
+    cmd = ["ffmpeg", "-hide_banner", "-v", "error", "-f", "lavfi", "-i", "color=s=64x64",
+           "-frames:v", "1", "-c:v", "h264_nvenc", "-f", "null", "-"]
+    try:
+        result = subprocess.run(cmd, capture_output=True, check=False, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return result.returncode == 0
+
+def h264_encoder_args() -> List[str]:
+    """ffmpeg video encoder arguments, NVENC when available, otherwise libx264"""
+    if _has_nvenc():
+        return ["-c:v", "h264_nvenc", "-preset", "p4", "-tune", "ll", "-rc", "vbr", "-cq", "23", "-pix_fmt", "yuv420p"]
+    return ["-vcodec", "libx264", "-vf", "format=yuv420p", "-crf", "18"]
+
+def open_video_writer(output_vid: str, width: int, height: int, fps: int, audio_path: str) -> subprocess.Popen:
+    """Start ffmpeg reading raw BGR frames from stdin and muxing them with audio_path into output_vid"""
+    cmd = ["ffmpeg", "-y", "-v", "warning",
+           "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+           "-i", audio_path, "-map", "0:v", "-map", "1:a",
+           *h264_encoder_args(), "-c:a", "aac", "-shortest", output_vid]
+    logger.info(" ".join(cmd))
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=width * height * 3 * 4)
+    # Drain stderr continuously so a long run of warnings can never fill the pipe and stall ffmpeg;
+    # only the tail is kept for the error report in close_video_writer
+    proc.stderr_tail = collections.deque(maxlen=50)
+    proc.stderr_thread = threading.Thread(target=_drain_stderr, args=(proc.stderr, proc.stderr_tail), daemon=True)
+    proc.stderr_thread.start()
+    return proc
+
+def _drain_stderr(stream, tail: collections.deque):
+    for line in iter(stream.readline, b""):
+        tail.append(line)
+    stream.close()
+
+def close_video_writer(proc: subprocess.Popen):
+    """Signal end of frames and wait for ffmpeg to finish writing the file"""
+    try:
+        proc.stdin.close()
+    except BrokenPipeError:
+        # ffmpeg already exited, its return code below tells whether that was an error
+        pass
+    proc.wait()
+    proc.stderr_thread.join()
+    if proc.returncode != 0:
+        stderr = b"".join(proc.stderr_tail)
+        logger.error(f"ffmpeg exited with code {proc.returncode}: {stderr.decode(errors='replace')}")
+        raise subprocess.CalledProcessError(proc.returncode, proc.args, stderr=stderr)
+
+def _no_clock():
+    return 0.0
+
 def osmakedirs(path_list):
     for path in path_list:
         os.makedirs(path) if not os.path.exists(path) else None
 
+class UNetWithPE(torch.nn.Module):
+    """Positional encoding + UNet in one module, so torch.compile captures them as one graph"""
+    def __init__(self, pe, unet):
+        super().__init__()
+        self.pe = pe
+        self.unet = unet
+
+    def forward(self, whisper_chunks, latents, timesteps):
+        audio_feature = self.pe(whisper_chunks)
+        return self.unet(latents, timesteps, encoder_hidden_states=audio_feature).sample
+
 class MuseAvatarV15:
+    # Number of face crops encoded per VAE call during avatar preparation
+    PREPARE_ENCODE_BATCH_SIZE = 16
+    # Number of preallocated full-resolution output frames cycled between blending and the video writer
+    OUTPUT_RING_SIZE = 3
+    PRECISION_DTYPES = {"fp16": torch.float16, "bf16": torch.bfloat16}
+
     def __init__(self, avatar_id, video_path, bbox_shift, batch_size, force_preparation=False,
                  parsing_mode='jaw', left_cheek_width=90, right_cheek_width=90,
                  audio_padding_length_left=2, audio_padding_length_right=2, fps=25,
@@ -71,7 +154,14 @@ class MuseAvatarV15:
                  unet_config=None,
                  whisper_dir=None,
                  gpu_id=0,
-                 debug=False):
+                 debug=False,
+                 compile_models=False,
+                 lanczos_resize=False,
+                 use_trt=False,
+                 whisper_int8=False,
+                 gpu_blend=False,
+                 vae_slice=0,
+                 precision="fp16"):
         """Initialize MuseAvatarV15
         
         Args:
@@ -94,6 +184,13 @@ class MuseAvatarV15:
             unet_config (str): UNet config file path
             whisper_dir (str): Whisper model directory
             gpu_id (int): GPU device ID
+            compile_models (bool): Whether to torch.compile UNet, VAE decoder and PE
+            lanczos_resize (bool): Use Lanczos instead of area interpolation for face crops during preparation
+            use_trt (bool): Build a fp16 TensorRT engine for the UNet (requires torch_tensorrt)
+            whisper_int8 (bool): Load Whisper linear layers as int8 (requires bitsandbytes)
+            gpu_blend (bool): Keep generated faces on GPU and resize/blend them there in res2combined
+            vae_slice (int): Decode at most this many latents per VAE call to cap decoder VRAM, 0 disables slicing
+            precision (str): Half precision dtype of UNet, VAE, PE and Whisper, "fp16" or "bf16" (Ampere and newer)
         """
         self.avatar_id = avatar_id
         self.video_path = video_path
@@ -115,6 +212,17 @@ class MuseAvatarV15:
         self.whisper_dir = whisper_dir
         self.gpu_id = gpu_id
         self.debug = debug
+        # Profiling timestamps in the hot paths are only taken in debug mode
+        self._clock = time.time if debug else _no_clock
+        self.compile_models = compile_models
+        self.lanczos_resize = lanczos_resize
+        self.use_trt = use_trt
+        self.whisper_int8 = whisper_int8
+        self.gpu_blend = gpu_blend and torch.cuda.is_available()
+        self.vae_slice = vae_slice
+        if precision not in self.PRECISION_DTYPES:
+            raise ValueError(f"Unsupported precision {precision}, expected one of {list(self.PRECISION_DTYPES)}")
+        self.precision = precision
         
         # Set paths
         if self.version == "v15":
@@ -130,7 +238,9 @@ class MuseAvatarV15:
         self.mask_out_path = os.path.join(self.avatar_path, "mask")
         self.mask_coords_path = os.path.join(self.avatar_path, "mask_coords.pkl")
         self.avatar_info_path = os.path.join(self.avatar_path, "avator_info.json")
-        self.frames_path = os.path.join(self.avatar_path, "frames.pkl")
+        self.frames_path = os.path.join(self.avatar_path, "frames.npy")
+        # Avatars prepared by older versions store the frame list as a pickle
+        self.legacy_frames_path = os.path.join(self.avatar_path, "frames.pkl")
         self.masks_path = os.path.join(self.avatar_path, "masks.pkl")
         
         self.avatar_info = {
@@ -149,6 +259,9 @@ class MuseAvatarV15:
         self.fp = None
         self.audio_processor = None
         self.weight_dtype = None
+        self._unet_with_pe = None
+        self._unet_dtype = None
+        self._vae_dtype = None
         self.timesteps = None
         
         # Data related
@@ -157,6 +270,15 @@ class MuseAvatarV15:
         self.frame_list_cycle = None
         self.mask_coords_list_cycle = None
         self.mask_list_cycle = None
+        self._cycle_len = 0
+        self._latent_cycle_len = 0
+        self._latents_stacked = None
+        self._latent_index_cache = {}
+        self._ori_crop_list_gpu = None
+        self._mask_list_gpu = None
+        self._out_ring = None
+        self.unet_stream = None
+        self.vae_stream = None
         
         # Initialization
         self.init()
@@ -171,7 +293,7 @@ class MuseAvatarV15:
         2. coords.pkl - face coordinates file
         3. mask_coords.pkl - mask coordinates file
         4. avator_info.json - config info file
-        5. frames.pkl - frame data file
+        5. frames.npy - frame data file
         6. masks.pkl - mask data file
         """
         # 1. Check if data preparation is needed
@@ -188,6 +310,7 @@ class MuseAvatarV15:
         need_preparation = self.force_preparation  # If force regeneration, set to True
         
         if not need_preparation and os.path.exists(self.avatar_path):
+            self._migrate_legacy_frames()
             # Check if all required files exist
             for file_path in required_files:
                 if not os.path.exists(file_path):
@@ -207,6 +330,10 @@ class MuseAvatarV15:
         # 2. Initialize device and models
         self.device = torch.device(f"cuda:{self.gpu_id}" if torch.cuda.is_available() else "cpu")
         self.timesteps = torch.tensor([0], device=self.device)
+        if self.device.type == "cuda":
+            # Offline inference runs the UNet of one batch on its own stream while the previous batch decodes
+            self.unet_stream = torch.cuda.Stream(device=self.device)
+            self.vae_stream = torch.cuda.Stream(device=self.device)
 
         # Load models
         self.vae, self.unet, self.pe = load_all_model(
@@ -216,16 +343,65 @@ class MuseAvatarV15:
             device=self.device
         )
 
-        # Convert to half precision
-        self.pe = self.pe.half().to(self.device)
-        self.vae.vae = self.vae.vae.half().to(self.device)
-        self.unet.model = self.unet.model.half().to(self.device)
+        # Convert to half precision, bf16 keeps fp32 range at the same bandwidth on Ampere and newer
+        dtype = self.PRECISION_DTYPES[self.precision]
+        self.pe = self.pe.to(device=self.device, dtype=dtype)
+        self.vae.vae = self.vae.vae.to(device=self.device, dtype=dtype)
+        self.unet.model = self.unet.model.to(device=self.device, dtype=dtype)
         self.weight_dtype = self.unet.model.dtype
+        # Cached so hot paths skip nn.Module attribute lookups
+        self._unet_dtype = self.unet.model.dtype
+        self._vae_dtype = self.vae.vae.dtype
+        # NHWC lets cuDNN pick the Tensor Core conv kernels for the fp16 UNet/VAE
+        self.unet.model = self.unet.model.to(memory_format=torch.channels_last)
+        self.vae.vae = self.vae.vae.to(memory_format=torch.channels_last)
+
+        if self.use_trt:
+            try:
+                import torch_tensorrt  # noqa: F401, registers the "tensorrt" torch.compile backend
+                # The engine is built for static shapes on the first (warmup) call, see the padding in generate_frames
+                self.unet.model = torch.compile(
+                    self.unet.model,
+                    backend="tensorrt",
+                    dynamic=False,
+                    options={"enabled_precisions": {self._unet_dtype}, "optimization_level": 5},
+                )
+            except ImportError:
+                logger.warning("torch_tensorrt is not installed, fall back to PyTorch UNet")
+                self.use_trt = False
+        self._unet_with_pe = UNetWithPE(self.pe, self.unet.model)
+        if self.compile_models:
+            # reduce-overhead replays CUDA graphs, so generate_frames pads every batch to batch_size
+            # to keep shapes static; the first call per shape (processor warmup) pays the compile cost
+            self.vae.vae.decode = torch.compile(self.vae.vae.decode, mode="reduce-overhead", dynamic=False)
+            if self.use_trt:
+                # UNet already runs as a TensorRT engine, only PE is left to compile
+                self.pe = torch.compile(self.pe, mode="reduce-overhead", dynamic=False)
+                self._unet_with_pe = UNetWithPE(self.pe, self.unet.model)
+            else:
+                # PE and UNet are captured as a single graph used by generate_frames
+                self._unet_with_pe = torch.compile(
+                    self._unet_with_pe, mode="reduce-overhead", fullgraph=False, dynamic=False
+                )
 
         # Initialize audio processor and Whisper model
         self.audio_processor = AudioProcessor(feature_extractor_path=self.whisper_dir)
-        self.whisper = WhisperModel.from_pretrained(self.whisper_dir)
-        self.whisper = self.whisper.to(device=self.device, dtype=self.weight_dtype).eval()
+        self.whisper = None
+        if self.whisper_int8:
+            try:
+                from transformers import BitsAndBytesConfig
+                # int8 weights with fp16 activations; quantized models are placed by device_map and cannot be .to()'d
+                self.whisper = WhisperModel.from_pretrained(
+                    self.whisper_dir,
+                    quantization_config=BitsAndBytesConfig(load_in_8bit=True),
+                    torch_dtype=self.weight_dtype,
+                    device_map={"": self.device},
+                ).eval()
+            except ImportError:
+                logger.warning(f"bitsandbytes is not installed, fall back to {self.precision} Whisper")
+        if self.whisper is None:
+            self.whisper = WhisperModel.from_pretrained(self.whisper_dir)
+            self.whisper = self.whisper.to(device=self.device, dtype=self.weight_dtype).eval()
         self.whisper.requires_grad_(False)
 
         # Initialize face parser
@@ -258,18 +434,51 @@ class MuseAvatarV15:
             self.input_latent_list_cycle = torch.load(self.latents_out_path)
             with open(self.coords_path, 'rb') as f:
                 self.coord_list_cycle = pickle.load(f)
-            with open(self.frames_path, 'rb') as f:
-                self.frame_list_cycle = pickle.load(f)
+            # Memory-mapped [N, H, W, 3] array: pages load lazily and are shared by the page cache
+            self.frame_list_cycle = np.load(self.frames_path, mmap_mode='r')
             with open(self.mask_coords_path, 'rb') as f:
                 self.mask_coords_list_cycle = pickle.load(f)
             with open(self.masks_path, 'rb') as f:
                 self.mask_list_cycle = pickle.load(f)
+        # Frame, coord and mask cycles are built together from the same frame list
+        self._cycle_len = len(self.frame_list_cycle)
+        # Stack the latent cycle once on device so a batch is a single index_select
+        self._latents_stacked = torch.cat(
+            [latent if latent.dim() == 4 else latent.unsqueeze(0) for latent in self.input_latent_list_cycle], dim=0
+        ).to(device=self.device, dtype=self.weight_dtype).contiguous(memory_format=torch.channels_last)
+        # Latents are indexed by their own cycle length, as before the stacking
+        self._latent_cycle_len = self._latents_stacked.shape[0]
+        if self._latent_cycle_len != self._cycle_len:
+            logger.warning(f"Latent cycle length {self._latent_cycle_len} differs from frame cycle length "
+                           f"{self._cycle_len} in avatar {self.avatar_id}")
+        if self.gpu_blend:
+            self._prepare_gpu_blend()
 
         # Warm up models is only needed in current thread
         # logger.info("Warming up models...")
         # self._warmup_models()
         # logger.info("Warmup complete")
 
+    def _migrate_legacy_frames(self):
+        """Convert frames.pkl of an avatar prepared by an older version to frames.npy
+
+        Runs once, so the avatar is not deleted and fully re-prepared just because of the new frame format.
+        The other prepared files are kept as they are.
+        """
+        if os.path.exists(self.frames_path) or not os.path.exists(self.legacy_frames_path):
+            return
+        logger.info(f"Converting {self.legacy_frames_path} to {self.frames_path}")
+        try:
+            with open(self.legacy_frames_path, 'rb') as f:
+                frame_list = pickle.load(f)
+            # Write to a temp file first so a crash never leaves a truncated frames.npy behind
+            tmp_path = self.frames_path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.stack(frame_list))
+            os.replace(tmp_path, self.frames_path)
+        except Exception as e:
+            logger.error(f"Failed to convert {self.legacy_frames_path}, the avatar will be re-prepared: {e}")
+
     def _warmup_models(self):
         """
         Warm up all models and feature extraction pipeline to avoid first-frame delay.
@@ -350,7 +559,7 @@ class MuseAvatarV15:
         coord_list, frame_list = get_landmark_and_bbox(input_img_list, self.bbox_shift)
         
         # Step 4: Extract latent features
-        input_latent_list = []
+        crop_frames = []
         idx = -1
         # coord_placeholder is used to mark invalid bounding boxes
         coord_placeholder = (0.0, 0.0, 0.0, 0.0)
@@ -366,13 +575,24 @@ class MuseAvatarV15:
                 y2 = min(y2, frame.shape[0])  # Ensure not out of image boundary
                 coord_list[idx] = [x1, y1, x2, y2]  # Update bbox in coord_list
                 
-            # Crop face region and resize to 256x256
-            crop_frame = frame[y1:y2, x1:x2]
-            resized_crop_frame = cv2.resize(crop_frame, (256, 256), interpolation=cv2.INTER_LANCZOS4)
-            
-            # Use VAE to extract latent features
-            latents = self.vae.get_latents_for_unet(resized_crop_frame)
-            input_latent_list.append(latents)
+            # Crop face region
+            crop_frames.append(frame[y1:y2, x1:x2])
+
+        # Resize to 256x256 in parallel (cv2 releases the GIL); area is the cheap choice for downscaling,
+        # Lanczos is kept as an opt-in for quality comparisons
+        interpolation = cv2.INTER_LANCZOS4 if self.lanczos_resize else cv2.INTER_AREA
+        with ThreadPoolExecutor() as executor:
+            resized_crop_frames = list(executor.map(
+                lambda crop_frame: cv2.resize(crop_frame, (256, 256), interpolation=interpolation),
+                crop_frames
+            ))
+
+        # Use VAE to extract latent features in batches
+        input_latent_list = []
+        for i in range(0, len(resized_crop_frames), self.PREPARE_ENCODE_BATCH_SIZE):
+            input_latent_list.extend(
+                self._get_latents_for_unet_batch(resized_crop_frames[i:i + self.PREPARE_ENCODE_BATCH_SIZE])
+            )
 
         # Step 5: Build cycle sequence (by forward + reverse order)
         self.frame_list_cycle = frame_list + frame_list[::-1]
@@ -382,26 +602,40 @@ class MuseAvatarV15:
         self.mask_list_cycle = []
 
         # Step 6: Generate and save masks
-        for i, frame in enumerate(tqdm(self.frame_list_cycle)):
-            # Save processed frame
-            cv2.imwrite(f"{self.full_imgs_path}/{str(i).zfill(8)}.png", frame)
-
-            # Get current frame's face bbox
-            x1, y1, x2, y2 = self.coord_list_cycle[i]
-            
-            # Select face parsing mode by version
-            if self.version == "v15":
-                mode = self.parsing_mode  # v15 supports different parsing modes
-            else:
-                mode = "raw"  # v1 only supports raw mode
-                
-            # Generate mask and crop box
-            mask, crop_box = get_image_prepare_material(frame, [x1, y1, x2, y2], fp=self.fp, mode=mode)
-
-            # Save mask and related info
-            cv2.imwrite(f"{self.mask_out_path}/{str(i).zfill(8)}.png", mask)
-            self.mask_coords_list_cycle += [crop_box]
-            self.mask_list_cycle.append(mask)
+        # PNG writes release the GIL, so they run on a pool while face parsing continues
+        num_frames = len(frame_list)
+        with ThreadPoolExecutor(max_workers=8) as writer:
+            write_futures = []
+            for i, frame in enumerate(tqdm(self.frame_list_cycle)):
+                # Save processed frame
+                img_path = f"{self.full_imgs_path}/{str(i).zfill(8)}.png"
+                write_futures.append(writer.submit(cv2.imwrite, img_path, frame, PNG_WRITE_PARAMS))
+
+                if i >= num_frames:
+                    # The second half of the cycle mirrors the first, reuse the mask of the same frame
+                    mirror_idx = 2 * num_frames - 1 - i
+                    mask = self.mask_list_cycle[mirror_idx]
+                    crop_box = self.mask_coords_list_cycle[mirror_idx]
+                else:
+                    # Get current frame's face bbox
+                    x1, y1, x2, y2 = self.coord_list_cycle[i]
+
+                    # Select face parsing mode by version
+                    if self.version == "v15":
+                        mode = self.parsing_mode  # v15 supports different parsing modes
+                    else:
+                        mode = "raw"  # v1 only supports raw mode
+
+                    # Generate mask and crop box
+                    mask, crop_box = get_image_prepare_material(frame, [x1, y1, x2, y2], fp=self.fp, mode=mode)
+
+                # Save mask and related info
+                mask_path = f"{self.mask_out_path}/{str(i).zfill(8)}.png"
+                write_futures.append(writer.submit(cv2.imwrite, mask_path, mask, PNG_WRITE_PARAMS))
+                self.mask_coords_list_cycle += [crop_box]
+                self.mask_list_cycle.append(mask)
+            for future in write_futures:
+                future.result()
 
         # Step 7: Save all processed data
         # Save mask coordinates
@@ -415,62 +649,213 @@ class MuseAvatarV15:
         # Save latent features
         torch.save(self.input_latent_list_cycle, self.latents_out_path)
 
-        # Save frame data
-        with open(self.frames_path, 'wb') as f:
-            pickle.dump(self.frame_list_cycle, f)
+        # Save frame data as one contiguous array (all frames share the video resolution);
+        # masks stay pickled because their crop boxes differ in size
+        # Keep the stacked array in memory too, so freshly prepared and loaded avatars index the same layout
+        self.frame_list_cycle = np.stack(self.frame_list_cycle)
+        np.save(self.frames_path, self.frame_list_cycle)
 
         # Save mask data
         with open(self.masks_path, 'wb') as f:
             pickle.dump(self.mask_list_cycle, f)
 
+    @torch.inference_mode()
+    def _get_latents_for_unet_batch(self, images: List[np.ndarray]) -> List[torch.Tensor]:
+        """Batched equivalent of VAE.get_latents_for_unet
+
+        Args:
+            images: 256x256 BGR uint8 face crops
+        Returns:
+            List of [1, 8, 32, 32] latents (masked + reference), one per image
+        """
+        x = torch.from_numpy(np.stack(images)).to(self.device)
+        x = x.flip(-1).permute(0, 3, 1, 2).float() / 255.  # BGR -> RGB, [N, 3, 256, 256]
+        half_mask = (self.vae._mask_tensor > 0.5).to(self.device)
+        masked_latents = self.vae.encode_latents(self.vae.transform(x * half_mask))
+        ref_latents = self.vae.encode_latents(self.vae.transform(x))
+        latents = torch.cat([masked_latents, ref_latents], dim=1)
+        return list(latents.split(1, dim=0))
+
+    def _get_latent_index(self, start_idx: int, batch_size: int) -> torch.Tensor:
+        """Device index tensor of the latent cycle slots for a batch starting at start_idx
+
+        Bounded by cycle length x distinct batch sizes, so after the first pass over the
+        cycle every batch is a dict lookup without building tensors.
+        """
+        key = (start_idx % self._latent_cycle_len, batch_size)
+        idx_tensor = self._latent_index_cache.get(key)
+        if idx_tensor is None:
+            idx_array = (key[0] + np.arange(batch_size, dtype=np.int64)) % self._latent_cycle_len
+            idx_tensor = torch.as_tensor(idx_array, device=self.device)
+            self._latent_index_cache[key] = idx_tensor
+        return idx_tensor
+
+    def decode_latents(self, latents: torch.Tensor, to_host: bool = True):
+        """Decode UNet latents to BGR uint8 frames
+
+        Same output as VAE.decode_latents, but the post-processing runs in place on the GPU
+        and is cast to uint8 there, so only uint8 pixels cross to the host.
+        Args:
+            to_host: If False, return the uint8 CUDA tensor instead (used by gpu_blend)
+        Returns:
+            numpy.ndarray: [B, H, W, 3] uint8 BGR frames
+        """
+        latents = latents / self.vae.scaling_factor
+        if self.vae_slice > 0 and latents.shape[0] > self.vae_slice:
+            # Decoder activations dominate peak VRAM, decode in slices so larger UNet batches fit
+            image = torch.cat([self._decode_slice(chunk) for chunk in latents.split(self.vae_slice)], dim=0)
+        else:
+            image = self.vae.vae.decode(latents).sample
+        # (x / 2 + 0.5).clamp(0, 1) * 255 == (x + 1) * 127.5 clamped to [0, 255]
+        image = image.float().add_(1.0).mul_(127.5).clamp_(0, 255).round_()
+        image = image.flip(1).permute(0, 2, 3, 1)  # RGB -> BGR, NCHW -> NHWC
+        image = image.to(torch.uint8)
+        if not to_host:
+            return image
+        return image.cpu().numpy()
+
+    def _decode_slice(self, chunk: torch.Tensor) -> torch.Tensor:
+        """Decode one vae_slice chunk of latents
+
+        With compile_models the decoder replays a CUDA graph whose output buffer is overwritten
+        by the next replay, so each slice is cloned before the next one runs, and a short last
+        slice is padded to vae_slice to keep the graph shape static.
+        """
+        if not self.compile_models:
+            return self.vae.vae.decode(chunk).sample
+        n = chunk.shape[0]
+        if n < self.vae_slice:
+            chunk = torch.cat([chunk, chunk[-1:].expand(self.vae_slice - n, *chunk.shape[1:])], dim=0)
+        torch.compiler.cudagraph_mark_step_begin()
+        return self.vae.vae.decode(chunk).sample[:n].clone()
+
+    def _resize_to_bboxes(self, recon: torch.Tensor, start_idx: int) -> List[Tuple[int, np.ndarray]]:
+        """Resize decoded faces to their face bbox size on GPU before the host copy
+
+        Args:
+            recon: [B, H, W, 3] uint8 CUDA frames from decode_latents(to_host=False)
+            start_idx: Frame index of recon[0]
+        Returns:
+            List of (frame index, bbox sized uint8 BGR face)
+        """
+        resized = []
+        for k in range(recon.shape[0]):
+            frame_idx = start_idx + k
+            x1, y1, x2, y2 = self.coord_list_cycle[frame_idx % self._cycle_len]
+            face = torch.nn.functional.interpolate(
+                recon[k].permute(2, 0, 1).unsqueeze(0).float(),
+                size=(y2 - y1, x2 - x1),
+                mode='bilinear',
+                align_corners=False
+            )[0].permute(1, 2, 0).round_().clamp_(0, 255).to(torch.uint8)
+            resized.append((frame_idx, face))
+        return [(frame_idx, face.cpu().numpy()) for frame_idx, face in resized]
+
+    def _prepare_gpu_blend(self):
+        """Upload the blending region of every cycle frame and its mask to the GPU
+
+        Only the mask crop box of each frame is kept on device (zero padded where the box
+        leaves the image, like PIL's crop), which is all get_image_blending touches.
+        """
+        self._ori_crop_list_gpu = []
+        self._mask_list_gpu = []
+        for frame, mask, crop_box in zip(self.frame_list_cycle, self.mask_list_cycle, self.mask_coords_list_cycle):
+            x_s, y_s, x_e, y_e = crop_box
+            h, w = frame.shape[:2]
+            ori_crop = np.zeros((y_e - y_s, x_e - x_s, 3), dtype=np.uint8)
+            sx0, sy0, sx1, sy1 = max(x_s, 0), max(y_s, 0), min(x_e, w), min(y_e, h)
+            ori_crop[sy0 - y_s:sy1 - y_s, sx0 - x_s:sx1 - x_s] = frame[sy0:sy1, sx0:sx1]
+            if mask.ndim == 3:
+                mask = mask[..., 0]
+            self._ori_crop_list_gpu.append(torch.from_numpy(ori_crop).to(self.device))
+            self._mask_list_gpu.append(torch.from_numpy(np.ascontiguousarray(mask)).to(self.device))
+
+    def _res2combined_gpu(self, res_frame: torch.Tensor, cycle_idx: int) -> np.ndarray:
+        """GPU version of resize + get_image_blending, only the blended crop box is copied back"""
+        x1, y1, x2, y2 = self.coord_list_cycle[cycle_idx]
+        x_s, y_s, x_e, y_e = self.mask_coords_list_cycle[cycle_idx]
+        if not res_frame.any():
+            logger.warning(f"res2combined: res_frame is all zero, return ori_frame, cycle_idx={cycle_idx}")
+            return self.frame_list_cycle[cycle_idx]
+        ori_crop = self._ori_crop_list_gpu[cycle_idx]
+        mask = self._mask_list_gpu[cycle_idx]
+        # Resize the generated face to the face bbox size
+        face = torch.nn.functional.interpolate(
+            res_frame.permute(2, 0, 1).unsqueeze(0).float(),
+            size=(y2 - y1, x2 - x1),
+            mode='bilinear',
+            align_corners=False
+        )[0].permute(1, 2, 0)
+        # Paste the face into the crop, then alpha blend the crop over the original with the mask
+        face_large = ori_crop.float()
+        face_large[y1 - y_s:y2 - y_s, x1 - x_s:x2 - x_s] = face
+        alpha = mask.float().unsqueeze(-1) / 255.
+        blended = ori_crop + (face_large - ori_crop) * alpha
+        blended = blended.round_().clamp_(0, 255).to(torch.uint8).cpu().numpy()
+
+        ori_frame = self.frame_list_cycle[cycle_idx]
+        h, w = ori_frame.shape[:2]
+        combine_frame = np.array(ori_frame)
+        sx0, sy0, sx1, sy1 = max(x_s, 0), max(y_s, 0), min(x_e, w), min(y_e, h)
+        combine_frame[sy0:sy1, sx0:sx1] = blended[sy0 - y_s:sy1 - y_s, sx0 - x_s:sx1 - x_s]
+        return combine_frame
+
     def res2combined(self, res_frame, idx):
         """Blend the generated frame with the original frame
         Args:
-            res_frame: Generated frame (numpy array)
+            res_frame: Generated frame (uint8 BGR numpy array from decode_latents)
             idx: Current frame index
         Returns:
             numpy.ndarray: Blended full frame
         """
-        t0 = time.time()
+        t0 = self._clock()
         # Get the face bbox and original frame for the current frame
-        bbox = self.coord_list_cycle[idx % len(self.coord_list_cycle)]
-        ori_frame = copy.deepcopy(self.frame_list_cycle[idx % len(self.frame_list_cycle)])
-        t1 = time.time()
+        cycle_idx = idx % self._cycle_len
+        if isinstance(res_frame, torch.Tensor):
+            return self._res2combined_gpu(res_frame, cycle_idx)
+        bbox = self.coord_list_cycle[cycle_idx]
+        # get_image_blending builds a new image and never writes to ori_frame, so no copy is needed
+        ori_frame = self.frame_list_cycle[cycle_idx]
+        t1 = self._clock()
         x1, y1, x2, y2 = bbox
         try:
             # Resize the generated frame to face region size
-            res_frame = cv2.resize(res_frame.astype(np.uint8), (x2 - x1, y2 - y1))
+            res_frame = cv2.resize(res_frame, (x2 - x1, y2 - y1))
         except Exception as e:
             logger.opt(exception=True).error(f"res2combined error: {str(e)}")
             return ori_frame
-        t2 = time.time()
+        t2 = self._clock()
         # Add protection: if res_frame is all zeros, return original frame directly
-        if np.all(res_frame == 0):
+        # Check one pixel first so the common non-zero case skips the full scan
+        if res_frame[0, 0, 0] == 0 and not res_frame.any():
             # if self.debug:
             logger.warning(f"res2combined: res_frame is all zero, return ori_frame, idx={idx}")
             return ori_frame
         # Get the corresponding mask and crop box
-        mask = self.mask_list_cycle[idx % len(self.mask_list_cycle)]
-        mask_crop_box = self.mask_coords_list_cycle[idx % len(self.mask_coords_list_cycle)]
-        t3 = time.time()
+        mask = self.mask_list_cycle[cycle_idx]
+        mask_crop_box = self.mask_coords_list_cycle[cycle_idx]
+        t3 = self._clock()
         # Blend the generated facial expression with the original frame
         combine_frame = get_image_blending(ori_frame, res_frame, bbox, mask, mask_crop_box)
-        t4 = time.time()
+        t4 = self._clock()
         if self.debug:
             logger.info(
                 f"[PROFILE] res2combined: idx={idx}, ori_copy={t1-t0:.4f}s, resize={t2-t1:.4f}s, mask_fetch={t3-t2:.4f}s, blend={t4-t3:.4f}s, total={t4-t0:.4f}s"
             )
         return combine_frame
     
+    @torch.inference_mode()
     def extract_whisper_feature(self, segment: np.ndarray, sampling_rate: int) -> torch.Tensor:
         """
         Extract whisper features for a single audio segment
         """
-        t0 = time.time()
+        t0 = self._clock()
+        # Compute the log-mel STFT on the inference device instead of the numpy CPU path
         audio_feature = self.audio_processor.feature_extractor(
             segment,
             return_tensors="pt",
-            sampling_rate=sampling_rate
+            sampling_rate=sampling_rate,
+            device=str(self.device)
         ).input_features
         if self.weight_dtype is not None:
             audio_feature = audio_feature.to(dtype=self.weight_dtype)
@@ -484,43 +869,43 @@ class MuseAvatarV15:
             audio_padding_length_left=self.audio_padding_length_left,
             audio_padding_length_right=self.audio_padding_length_right,
         )
-        t1 = time.time()
+        t1 = self._clock()
         if self.debug:
             logger.info(f"[PROFILE] extract_whisper_feature: duration={t1-t0:.4f}s, segment_len={len(segment)}, sampling_rate={sampling_rate}")
         return whisper_chunks  # shape: [num_frames, 50, 384]
 
-    @torch.no_grad()
+    @torch.inference_mode()
     def generate_frame(self, whisper_chunk: torch.Tensor, idx: int) -> np.ndarray:
         """
         Generate a frame based on whisper features and frame index
         """
-        import time
-        t0 = time.time()
+        t0 = self._clock()
         # Ensure whisper_chunk shape is (B, 50, 384)
         if whisper_chunk.ndim == 2:
             whisper_chunk = whisper_chunk.unsqueeze(0)
-        t1 = time.time()
-        latent = self.input_latent_list_cycle[idx % len(self.input_latent_list_cycle)]
+        t1 = self._clock()
+        latent = self.input_latent_list_cycle[idx % self._latent_cycle_len]
         if latent.dim() == 3:
             latent = latent.unsqueeze(0)
-        t2 = time.time()
-        audio_feature = self.pe(whisper_chunk.to(self.device))
-        t3 = time.time()
-        latent = latent.to(device=self.device, dtype=self.unet.model.dtype)
-        t4 = time.time()
+        t2 = self._clock()
+        audio_feature = self.pe(whisper_chunk.to(self.device, non_blocking=True))
+        t3 = self._clock()
+        latent = latent.to(device=self.device, dtype=self._unet_dtype, memory_format=torch.channels_last)
+        t4 = self._clock()
         pred_latents = self.unet.model(
             latent,
             self.timesteps,
             encoder_hidden_states=audio_feature
         ).sample
 
-        t5 = time.time()
-        pred_latents = pred_latents.to(device=self.device, dtype=self.vae.vae.dtype)
-        recon = self.vae.decode_latents(pred_latents)
-        t6 = time.time()
+        t5 = self._clock()
+        if pred_latents.dtype != self._vae_dtype:
+            pred_latents = pred_latents.to(dtype=self._vae_dtype)
+        recon = self.decode_latents(pred_latents)
+        t6 = self._clock()
         res_frame = recon[0]  # Only one frame, take the first
         combined_frame = self.res2combined(res_frame, idx)
-        t7 = time.time()
+        t7 = self._clock()
 
         # Profile statistics, print average every 1 second
         if self.debug:
@@ -565,7 +950,7 @@ class MuseAvatarV15:
         frame = self.frame_list_cycle[idx % len(self.frame_list_cycle)]
         return frame
 
-    @torch.no_grad()
+    @torch.inference_mode()
     def generate_frames(self, whisper_chunks: torch.Tensor, start_idx: int, batch_size: int) -> list:
         """
         Batch generate multiple frames based on whisper features and frame index
@@ -574,7 +959,7 @@ class MuseAvatarV15:
         batch_size: batch size
         Return: List of (recon, idx) tuples, length is batch_size
         """
-        t0 = time.time()
+        t0 = self._clock()
         # Ensure whisper_chunks shape is (B, 50, 384)
         if whisper_chunks.ndim == 2:
             whisper_chunks = whisper_chunks.unsqueeze(0)
@@ -582,37 +967,38 @@ class MuseAvatarV15:
             pass
         B = whisper_chunks.shape[0]
         assert B == batch_size, f"whisper_chunks.shape[0] ({B}) != batch_size ({batch_size})"
+        if (self.compile_models or self.use_trt) and B < self.batch_size:
+            # Pad short batches so compiled graphs see a single static shape
+            pad = whisper_chunks.new_zeros((self.batch_size - B,) + tuple(whisper_chunks.shape[1:]))
+            whisper_chunks = torch.cat([whisper_chunks, pad], dim=0)
+            batch_size = self.batch_size
         idx_list = [start_idx + i for i in range(batch_size)]
-        latent_list = []
-        t1 = time.time()
-        for idx in idx_list:
-            latent = self.input_latent_list_cycle[idx % len(self.input_latent_list_cycle)]
-            if latent.dim() == 3:
-                latent = latent.unsqueeze(0)
-            latent_list.append(latent)
-        latent_batch = torch.cat(latent_list, dim=0)  # [B, ...]
-        t2 = time.time()
-        audio_feature = self.pe(whisper_chunks.to(self.device))
-        t3 = time.time()
-        latent_batch = latent_batch.to(device=self.device, dtype=self.unet.model.dtype)
-        t4 = time.time()
-        pred_latents = self.unet.model(
+        t1 = self._clock()
+        idx_tensor = self._get_latent_index(start_idx, batch_size)
+        latent_batch = self._latents_stacked.index_select(0, idx_tensor)  # [B, ...]
+        t2 = self._clock()
+        # The stacked cycle is already on device in the UNet dtype, only the layout may need fixing
+        if not latent_batch.is_contiguous(memory_format=torch.channels_last):
+            latent_batch = latent_batch.contiguous(memory_format=torch.channels_last)
+        t3 = self._clock()
+        pred_latents = self._unet_with_pe(
+            whisper_chunks.to(self.device, non_blocking=True),
             latent_batch,
-            self.timesteps,
-            encoder_hidden_states=audio_feature
-        ).sample
+            self.timesteps
+        )
         # # Force set pred_latents to all nan for debugging： unet get nan value
         # pred_latents[:] = float('nan')
-        t5 = time.time()
-        pred_latents = pred_latents.to(device=self.device, dtype=self.vae.vae.dtype)
-        recon = self.vae.decode_latents(pred_latents)
-        t6 = time.time()
-        avg_time = (t6 - t0) / B if B > 0 else 0.0
+        t4 = self._clock()
+        if pred_latents.dtype != self._vae_dtype:
+            pred_latents = pred_latents.to(dtype=self._vae_dtype)
+        recon = self.decode_latents(pred_latents, to_host=not self.gpu_blend)
+        t5 = self._clock()
+        avg_time = (t5 - t0) / B if B > 0 else 0.0
         if self.debug:
             logger.info(
                 f"[PROFILE] generate_frames: start_idx={start_idx}, batch_size={batch_size}, "
-                f"prep_whisper={t1-t0:.4f}s, prep_latent={t2-t1:.4f}s, pe={t3-t2:.4f}s, "
-                f"latent_to={t4-t3:.4f}s, unet={t5-t4:.4f}s, vae={t6-t5:.4f}s, total={t6-t0:.4f}s, total_per_frame={avg_time:.4f}s"
+                f"prep_whisper={t1-t0:.4f}s, prep_latent={t2-t1:.4f}s, latent_to={t3-t2:.4f}s, "
+                f"pe_unet={t4-t3:.4f}s, vae={t5-t4:.4f}s, total={t5-t0:.4f}s, total_per_frame={avg_time:.4f}s"
             )
             # debug for nan value
             logger.info(f"latent_batch stats: min={latent_batch.min().item()}, max={latent_batch.max().item()}, mean={latent_batch.mean().item()}, nan_count={(torch.isnan(latent_batch).sum().item() if torch.isnan(latent_batch).any() else 0)}")
@@ -620,12 +1006,16 @@ class MuseAvatarV15:
             if isinstance(recon, np.ndarray):
                 logger.info(f"recon stats: min={recon.min()}, max={recon.max()}, mean={recon.mean()}, nan_count={np.isnan(recon).sum()}")
             elif isinstance(recon, torch.Tensor):
-                logger.info(f"recon stats: min={recon.min().item()}, max={recon.max().item()}, mean={recon.mean().item()}, nan_count={(torch.isnan(recon).sum().item() if torch.isnan(recon).is_floating_point() else 0)}")
+                nan_count = torch.isnan(recon).sum().item() if recon.is_floating_point() else 0
+                logger.info(
+                    f"recon stats: min={recon.min().item()}, max={recon.max().item()}, "
+                    f"mean={recon.float().mean().item()}, nan_count={nan_count}"
+                )
             else:
                 logger.info(f"recon type: {type(recon)}")
         return [(recon[i], idx_list[i]) for i in range(B)]
 
-    @torch.no_grad()
+    @torch.inference_mode()
     def inference(self, audio_path, out_vid_name, fps, skip_save_images):
         """Inference to generate talking avatar video
         
@@ -633,11 +1023,8 @@ class MuseAvatarV15:
             audio_path: Input audio file path
             out_vid_name: Output video name (based on audio file name)
             fps: Video frame rate
-            skip_save_images: Whether to skip saving intermediate frame images
+            skip_save_images: Whether to skip saving the output video
         """
-        # Create temp directory for generated frames
-        tmp_dir = os.path.join(self.avatar_path, 'tmp')
-        os.makedirs(tmp_dir, exist_ok=True)
         logger.info("start inference")
 
         ############################################## Stage 1: Audio feature extraction ##############################################
@@ -663,50 +1050,106 @@ class MuseAvatarV15:
         ############################################## Stage 2: Batch generation ##############################################
         # Calculate total number of frames to generate
         video_num = len(whisper_chunks)
-        # Create result frame queue for multithreaded processing
-        res_frame_queue = queue.Queue()
+        # Bounded queues between GPU -> blending -> disk writing give back-pressure,
+        # so the three stages overlap without buffering the whole video in memory
+        res_frame_queue = queue.Queue(maxsize=2)  # in batches
         self.idx = 0
 
-        # Create processing thread
+        # Frames are piped straight into ffmpeg, no intermediate images on disk
+        save_video = out_vid_name is not None and not skip_save_images
+        write_queue = None
+        free_frames = None
+        # Exceptions raised in the blending/writer threads, re-raised here once they are joined
+        errors = []
+        if save_video:
+            os.makedirs(self.video_out_path, exist_ok=True)
+            output_vid = os.path.join(self.video_out_path, f"{out_vid_name}.mp4")
+            height, width = self.frame_list_cycle[0].shape[:2]
+            video_writer = open_video_writer(output_vid, width, height, fps, audio_path)
+            write_queue = queue.Queue(maxsize=self.batch_size * 4)
+            # Output frames come from a small ring of preallocated buffers: blending takes a free one,
+            # the writer hands it back once ffmpeg has consumed it
+            if self._out_ring is None or self._out_ring[0].shape != (height, width, 3):
+                self._out_ring = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self.OUTPUT_RING_SIZE)]
+            free_frames = queue.Queue()
+            for out in self._out_ring:
+                free_frames.put(out)
+            # Create video writing thread
+            write_thread = threading.Thread(
+                target=self.write_frames,
+                args=(write_queue, video_writer.stdin, free_frames, errors)
+            )
+            write_thread.start()
+
+        # Create processing (blending) thread
         process_thread = threading.Thread(
             target=self.process_frames, 
-            args=(res_frame_queue, video_num, skip_save_images)
+            args=(res_frame_queue, video_num, not save_video, write_queue, free_frames, errors)
         )
         process_thread.start()
 
-        # Create data generator for batch processing
-        gen = datagen(
-            whisper_chunks,
-            self.input_latent_list_cycle,
-            self.batch_size
-        )
-        
+        # Upload the whisper chunks once; each batch below is a view of this tensor and its latents
+        # an index_select of the on-device latent cycle, so no per-batch stacking or host->device copies
+        if not isinstance(whisper_chunks, torch.Tensor):
+            whisper_chunks = torch.stack(list(whisper_chunks))
+        whisper_chunks = whisper_chunks.to(self.device, non_blocking=True)
+        num_batches = int(np.ceil(float(video_num) / self.batch_size))
+
         start_time = time.time()
 
+        # Two-stage GPU pipeline: UNet of batch i is queued on unet_stream before the host blocks on
+        # the device->host copy of batch i-1, so the UNet overlaps the previous VAE decode + resize.
+        # Without CUDA both streams are None and torch.cuda.stream(None) is a no-op.
+        if self.unet_stream is not None:
+            self.unet_stream.wait_stream(torch.cuda.current_stream(self.device))
+        pending = None  # (recon, start_idx) queued on vae_stream, not yet copied to host
         # Batch generate facial expressions
-        for i, (whisper_batch, latent_batch) in enumerate(tqdm(gen, total=int(np.ceil(float(video_num) / self.batch_size)))):
-            # 1. Process audio features
-            audio_feature_batch = self.pe(whisper_batch.to(self.device))
-            # 2. Prepare latent features
-            latent_batch = latent_batch.to(device=self.device, dtype=self.unet.model.dtype)
-
-            # 3. Use UNet to generate facial expressions
-            pred_latents = self.unet.model(
-                latent_batch,
-                self.timesteps,
-                encoder_hidden_states=audio_feature_batch
-            ).sample
-            
-            # 4. Decode generated latent features
-            pred_latents = pred_latents.to(device=self.device, dtype=self.vae.vae.dtype)
-            recon = self.vae.decode_latents(pred_latents)
-            
-            # 5. Put generated frames into queue
-            for res_frame in recon:
-                res_frame_queue.put(res_frame)
-
-        # Wait for processing thread to finish
+        for i in tqdm(range(num_batches)):
+            if errors:
+                # A downstream stage failed, stop generating; the threads keep draining until the sentinel
+                pending = None
+                break
+            start_idx = i * self.batch_size
+            n = min(self.batch_size, video_num - start_idx)
+            with torch.cuda.stream(self.unet_stream):
+                # 1. Process audio features
+                audio_feature_batch = self.pe(whisper_chunks[start_idx:start_idx + n])
+                # 2. Prepare latent features
+                latent_batch = self._latents_stacked.index_select(0, self._get_latent_index(start_idx, n))
+
+                # 3. Use UNet to generate facial expressions
+                pred_latents = self.unet.model(
+                    latent_batch,
+                    self.timesteps,
+                    encoder_hidden_states=audio_feature_batch
+                ).sample
+                if pred_latents.dtype != self._vae_dtype:
+                    pred_latents = pred_latents.to(dtype=self._vae_dtype)
+
+            with torch.cuda.stream(self.vae_stream):
+                # 4. Resize the previous batch to the face bboxes and copy it out while this UNet runs
+                if pending is not None:
+                    res_frame_queue.put(self._resize_to_bboxes(*pending))
+                # 5. Decode generated latent features once the UNet of this batch is done
+                if self.vae_stream is not None:
+                    self.vae_stream.wait_stream(self.unet_stream)
+                    pred_latents.record_stream(self.vae_stream)
+                recon = self.decode_latents(pred_latents, to_host=False)
+                pending = (recon, start_idx)
+        if pending is not None:
+            with torch.cuda.stream(self.vae_stream):
+                res_frame_queue.put(self._resize_to_bboxes(*pending))
+        res_frame_queue.put(None)
+
+        # Wait for processing thread to finish, then drain the writer
         process_thread.join()
+        if save_video:
+            write_queue.put(None)
+            write_thread.join()
+            close_video_writer(video_writer)
+        if errors:
+            # close_video_writer raised already if ffmpeg itself failed
+            raise errors[0]
 
         ############################################## Stage 3: Post-processing ##############################################
         # Output processing time statistics
@@ -719,113 +1162,140 @@ class MuseAvatarV15:
                 video_num,
                 time.time() - start_time))
 
-        # Save video if needed
-        if out_vid_name is not None and not skip_save_images:
-            # 1. Convert image sequence to video
-            temp_video = os.path.join(self.avatar_path, "temp.mp4")
-            cmd_img2video = f"ffmpeg -y -v warning -r {fps} -f image2 -i {tmp_dir}/%08d.png -vcodec libx264 -vf format=yuv420p -crf 18 {temp_video}"
-            logger.info(cmd_img2video)
-            os.system(cmd_img2video)
-
-            # 2. Combine audio into video
-            os.makedirs(self.video_out_path, exist_ok=True)
-            output_vid = os.path.join(self.video_out_path, f"{out_vid_name}.mp4")
-            cmd_combine_audio = f"ffmpeg -y -v warning -i {audio_path} -i {temp_video} {output_vid}"
-            logger.info(cmd_combine_audio)
-            os.system(cmd_combine_audio)
-
-            # 3. Clean up temp files
-            os.remove(temp_video)
-            shutil.rmtree(tmp_dir)
+        if save_video:
             logger.info(f"Result saved to: {output_vid}")
         logger.info("\n")
 
-    def process_frames(self, res_frame_queue, video_len, skip_save_images):
+    def _blend_into(self, out: np.ndarray, res_frame: np.ndarray, cycle_idx: int):
+        """In-place equivalent of get_image_blending, writing the blended frame into out
+
+        Outside the face bbox the mask blends the original frame with itself, so only the bbox
+        region is composited; everything else is a straight copy of the original frame.
+        """
+        np.copyto(out, self.frame_list_cycle[cycle_idx])
+        x1, y1, x2, y2 = self.coord_list_cycle[cycle_idx]
+        x_s, y_s = self.mask_coords_list_cycle[cycle_idx][:2]
+        mask = self.mask_list_cycle[cycle_idx]
+        if mask.ndim == 3:
+            mask = mask[..., 0]
+        h, w = out.shape[:2]
+        fx0, fy0, fx1, fy1 = max(x1, 0), max(y1, 0), min(x2, w), min(y2, h)
+        region = out[fy0:fy1, fx0:fx1]
+        face = res_frame[fy0 - y1:fy1 - y1, fx0 - x1:fx1 - x1].astype(np.uint16)
+        alpha = mask[fy0 - y_s:fy1 - y_s, fx0 - x_s:fx1 - x_s, None].astype(np.uint16)
+        # Same rounding as PIL's masked paste: (face * a + ori * (255 - a) + 127) / 255
+        face *= alpha
+        face += region * (255 - alpha)
+        face += 127
+        face //= 255
+        region[...] = face
+
+    def process_frames(self, res_frame_queue, video_len, skip_save_images, write_queue=None, free_frames=None,
+                       errors=None):
         """Process generated video frames
         
         This method runs in a separate thread and is responsible for processing generated video frames, including:
         1. Get generated frames from the queue
-        2. Resize frames to match the original video
-        3. Blend generated facial expressions with the original frame
-        4. Save processed frames (if needed)
+        2. Blend generated facial expressions (already resized on GPU) with the original frame
+        3. Save processed frames (if needed)
         
         Args:
-            res_frame_queue: Queue for generated frames
+            res_frame_queue: Queue of [(frame index, resized face)] batches, terminated by a None sentinel
             video_len: Total number of frames to process
             skip_save_images: Whether to skip saving intermediate frame images
+            write_queue: Queue drained by write_frames, None when the video is not saved
+            free_frames: Queue of reusable output buffers recycled by write_frames, None when the video is not saved
+            errors: List the first exception is appended to; later batches are then drained without processing
+                so the producer never blocks on the bounded res_frame_queue
         """
         logger.info(video_len)
-        while True:
-            # Exit if all frames have been processed
-            if self.idx >= video_len - 1:
-                break
-                
-            try:
-                # Get generated frame from queue, 1s timeout
-                start = time.time()
-                res_frame = res_frame_queue.get(block=True, timeout=1)
-            except queue.Empty:
+        cycle_len = self._cycle_len
+        # Without a writer nothing holds on to the blended frame, one scratch buffer is enough
+        scratch = np.empty_like(self.frame_list_cycle[0]) if free_frames is None else None
+        # The producer puts one decoded batch at a time and a None sentinel after the last batch;
+        # faces arrive already resized to their bbox on GPU, tagged with their frame index
+        for res_frame_batch in iter(res_frame_queue.get, None):
+            if errors:
                 continue
-
-            # Get the face bbox and original frame for the current frame
-            bbox = self.coord_list_cycle[self.idx % (len(self.coord_list_cycle))]
-            ori_frame = copy.deepcopy(self.frame_list_cycle[self.idx % (len(self.frame_list_cycle))])
-            x1, y1, x2, y2 = bbox
-            
             try:
-                # Resize the generated frame to face region size
-                res_frame = cv2.resize(res_frame.astype(np.uint8), (x2 - x1, y2 - y1))
-            except:
-                continue
-                
-            # Get the corresponding mask and crop box
-            mask = self.mask_list_cycle[self.idx % (len(self.mask_list_cycle))]
-            mask_crop_box = self.mask_coords_list_cycle[self.idx % (len(self.mask_coords_list_cycle))]
-            
-            # Blend the generated facial expression with the original frame
-            combine_frame = get_image_blending(ori_frame, res_frame, bbox, mask, mask_crop_box)
+                for frame_idx, res_frame in res_frame_batch:
+                    # Blend the generated facial expression with the original frame into a reused buffer
+                    combine_frame = scratch if free_frames is None else free_frames.get()
+                    self._blend_into(combine_frame, res_frame, frame_idx % cycle_len)
 
-            # Save processed frame if needed
-            if skip_save_images is False:
-                cv2.imwrite(f"{self.avatar_path}/tmp/{str(self.idx).zfill(8)}.png", combine_frame)
-                
-            self.idx = self.idx + 1
+                    # Save processed frame if needed
+                    if skip_save_images is False and write_queue is not None:
+                        write_queue.put(combine_frame)
+
+                    self.idx = self.idx + 1
+            except Exception as e:
+                logger.opt(exception=True).error(f"process_frames error: {str(e)}")
+                if errors is None:
+                    raise
+                errors.append(e)
 
-def read_audio_file(audio_path: str) -> Tuple[bytes, int]:
-    """Read audio file and return byte stream and sample rate
+    def write_frames(self, write_queue, stream, free_frames=None, errors=None):
+        """Write blended frames as raw BGR bytes to stream until a None sentinel is received
+
+        Args:
+            write_queue: Queue of frames produced by process_frames, in order
+            stream: Binary stream, usually the stdin of the ffmpeg writer
+            free_frames: Queue the written frame buffers are handed back to for reuse
+            errors: List a write error (e.g. BrokenPipeError when ffmpeg exited early) is appended to;
+                frames keep being consumed and recycled afterwards so process_frames never blocks
+        """
+        failed = False
+        while True:
+            frame = write_queue.get()
+            if frame is None:
+                break
+            if not failed:
+                try:
+                    stream.write(np.ascontiguousarray(frame, dtype=np.uint8))
+                except OSError as e:
+                    logger.error(f"write_frames error, ffmpeg stopped reading: {str(e)}")
+                    failed = True
+                    if errors is not None:
+                        errors.append(e)
+            if free_frames is not None:
+                free_frames.put(frame)
+
+def read_audio_file(audio_path: str, target_sample_rate: int = 16000) -> Tuple[np.ndarray, int]:
+    """Read audio file as mono float32 samples at target_sample_rate
     
     Args:
         audio_path: Audio file path
+        target_sample_rate: Output sample rate, 16kHz for the algorithm
         
     Returns:
-        Tuple[bytes, int]: (audio byte stream, sample rate)
+        Tuple[np.ndarray, int]: (float32 mono samples, sample rate)
     """
     try:
-        # Use librosa to read audio file
-        audio_data, sampling_rate = librosa.load(audio_path, sr=16000)  # Fixed sample rate 16kHz
-        
-        # Convert numpy array to byte stream
-        audio_bytes = audio_data.astype(np.float32).tobytes()
+        # soundfile decodes in C (libsndfile), soxr resamples only when needed
+        audio_data, sampling_rate = soundfile.read(audio_path, dtype='float32', always_2d=False)
+        if audio_data.ndim > 1:
+            audio_data = audio_data.mean(axis=1, dtype=np.float32)
+        if sampling_rate != target_sample_rate:
+            audio_data = soxr.resample(audio_data, sampling_rate, target_sample_rate).astype(np.float32, copy=False)
+            sampling_rate = target_sample_rate
         
         logger.info("Successfully read audio file: {}", audio_path)
         logger.info("Sample Rate: {}, Duration: {:.2f}s", sampling_rate, len(audio_data)/sampling_rate)
         
-        return audio_bytes, sampling_rate
+        return audio_data, sampling_rate
         
     except Exception as e:
         logger.error("Error reading audio file {}: {}", audio_path, str(e))
         return None, None
 
 
-def run_batch_test(args):
-    """Run batch audio test"""
-    # Initialize digital avatar
-    avatar = MuseAvatarV15(
+def _create_avatar(args, force_preparation):
+    return MuseAvatarV15(
         avatar_id=args.avatar_id,
         video_path=args.video_path,
         bbox_shift=args.bbox_shift,
         batch_size=args.batch_size,
-        force_preparation=args.force_preparation,
+        force_preparation=force_preparation,
         parsing_mode=args.parsing_mode,
         left_cheek_width=args.left_cheek_width,
         right_cheek_width=args.right_cheek_width,
@@ -839,29 +1309,78 @@ def run_batch_test(args):
         unet_model_path=args.unet_model_path,
         unet_config=args.unet_config,
         whisper_dir=args.whisper_dir,
-        gpu_id=args.gpu_id
+        gpu_id=args.gpu_id,
+        precision=args.precision
     )
 
+
+# Per-process state of the batch test worker pool
+_worker_avatar = None
+_worker_args = None
+
+
+def _init_worker(args, prepare_lock, prepared):
+    """Build one avatar per worker process"""
+    global _worker_avatar, _worker_args
+    _worker_args = args
+    # Only the first worker may (re)generate the avatar data, the others wait and reuse it
+    with prepare_lock:
+        _worker_avatar = _create_avatar(args, args.force_preparation and not prepared.is_set())
+        prepared.set()
+
+
+def _process_one_audio(audio_path):
+    # Use audio file name as output video name
+    audio_name = os.path.splitext(os.path.basename(audio_path))[0]
+    logger.info(f"\nProcessing audio: {audio_path}")
+    _worker_avatar.inference(
+        audio_path=audio_path,
+        out_vid_name=audio_name,  # Use audio file name directly
+        fps=_worker_args.fps,
+        skip_save_images=_worker_args.skip_save_images
+    )
+    return audio_path
+
+
+def run_batch_test(args):
+    """Run batch audio test
+    
+    With args.workers > 1 the audio files are spread over a pool of worker processes sharing the GPU,
+    so that the UNet/VAE work of one file overlaps the blending and encoding of another.
+    """
     # Get all audio files in the audio directory
     audio_files = []
     for ext in ['*.wav', '*.mp3']:
         audio_files.extend(glob.glob(os.path.join(args.audio_dir, ext)))
     audio_files.sort()
 
-    # Process each audio file
-    for audio_path in audio_files:
-        # Use audio file name as output video name
-        audio_name = os.path.splitext(os.path.basename(audio_path))[0]
-        
-        logger.info(f"\nProcessing audio: {audio_path}")
-        
-        # Run inference
-        avatar.inference(
-            audio_path=audio_path,
-            out_vid_name=audio_name,  # Use audio file name directly
-            fps=args.fps,
-            skip_save_images=args.skip_save_images
-        )
+    if args.workers <= 1:
+        # Initialize digital avatar
+        avatar = _create_avatar(args, args.force_preparation)
+        # Process each audio file
+        for audio_path in audio_files:
+            # Use audio file name as output video name
+            audio_name = os.path.splitext(os.path.basename(audio_path))[0]
+
+            logger.info(f"\nProcessing audio: {audio_path}")
+
+            # Run inference
+            avatar.inference(
+                audio_path=audio_path,
+                out_vid_name=audio_name,  # Use audio file name directly
+                fps=args.fps,
+                skip_save_images=args.skip_save_images
+            )
+        return
+
+    # CUDA cannot be re-initialized in a forked child, so always spawn
+    ctx = multiprocessing.get_context("spawn")
+    prepare_lock = ctx.Lock()
+    prepared = ctx.Event()
+    with ctx.Pool(processes=args.workers, initializer=_init_worker,
+                  initargs=(args, prepare_lock, prepared)) as pool:
+        for audio_path in pool.imap_unordered(_process_one_audio, audio_files):
+            logger.info(f"Finished audio: {audio_path}")
 
 def run_realtime_test(args):
     """Run real-time processing test, using pipeline to process audio
@@ -891,7 +1410,8 @@ def run_realtime_test(args):
         unet_model_path=args.unet_model_path,
         unet_config=args.unet_config,
         whisper_dir=args.whisper_dir,
-        gpu_id=args.gpu_id
+        gpu_id=args.gpu_id,
+        precision=args.precision
     )
 
     # Get all audio files in the audio directory
@@ -904,13 +1424,12 @@ def run_realtime_test(args):
     for audio_path in audio_files:
         try:
             # Read audio file
-            audio_bytes, sample_rate = read_audio_file(audio_path)
-            if audio_bytes is None or sample_rate is None:
+            audio_data, sample_rate = read_audio_file(audio_path)
+            if audio_data is None or sample_rate is None:
                 logger.error(f"Skip audio {audio_path}: failed to read")
                 continue
                 
             # Check audio length
-            audio_data = np.frombuffer(audio_bytes, dtype=np.float32)
             duration = len(audio_data) / sample_rate                
             logger.info(f"\nProcessing audio: {audio_path} (duration: {duration:.2f}s)")
             
@@ -919,7 +1438,7 @@ def run_realtime_test(args):
             
             # Create SpeechAudio object
             speech_audio = SpeechAudio(
-                audio_data=audio_bytes,
+                audio_data=audio_data.tobytes(),
                 speech_id="1",
                 end_of_speech=True,
                 sample_rate=sample_rate
@@ -932,35 +1451,18 @@ def run_realtime_test(args):
             
             # Save results
             if not args.skip_save_images:
-                # Create temp directory
-                tmp_dir = os.path.join(avatar.avatar_path, 'tmp')
-                os.makedirs(tmp_dir, exist_ok=True)
-                
-                # Save frames
-                logger.info("Saving video frames...")
-                for i, frame in enumerate(frames):
-                    cv2.imwrite(os.path.join(tmp_dir, f"{str(i).zfill(8)}.png"), frame)
-                
                 # Generate video
-                temp_video = os.path.join(avatar.avatar_path, "temp.mp4")
                 output_name = f"{os.path.splitext(os.path.basename(audio_path))[0]}_pipeline"  # Use pipeline suffix to indicate pipeline processing version
                 output_vid = os.path.join(avatar.video_out_path, f"{output_name}.mp4")
                 
-                # 1. Convert image sequence to video
+                # Pipe frames into ffmpeg, which encodes and muxes the audio in one pass
                 logger.info("Generating video...")
-                cmd_img2video = f"ffmpeg -y -v warning -r {args.fps} -f image2 -i {tmp_dir}/%08d.png -vcodec libx264 -vf format=yuv420p -crf 18 {temp_video}"
-                logger.info(cmd_img2video)
-                os.system(cmd_img2video)
-
-                # 2. Combine audio into video
                 os.makedirs(avatar.video_out_path, exist_ok=True)
-                cmd_combine_audio = f"ffmpeg -y -v warning -i {audio_path} -i {temp_video} {output_vid}"
-                logger.info(cmd_combine_audio)
-                os.system(cmd_combine_audio)
-
-                # 3. Clean up temp files
-                os.remove(temp_video)
-                shutil.rmtree(tmp_dir)
+                height, width = frames[0].shape[:2]
+                video_writer = open_video_writer(output_vid, width, height, args.fps, audio_path)
+                for frame in frames:
+                    video_writer.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8))
+                close_video_writer(video_writer)
                 logger.info(f"Result saved to: {output_vid}")
 
             process_time = time.time() - start_time
@@ -974,6 +1476,7 @@ def run_realtime_test(args):
 
 # Run main function
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
     parser.add_argument("--version", type=str, default="v15", choices=["v1", "v15"], help="MuseTalk version")
     parser.add_argument("--ffmpeg_path", type=str, default="./ffmpeg-4.4-amd64-static/", help="ffmpeg path")
     parser.add_argument("--gpu_id", type=int, default=0, help="GPU id")
@@ -997,6 +1500,8 @@ if __name__ == "__main__":
     parser.add_argument("--video_path", type=str, default=os.path.join(musetalk_module_path, "data", "video", "sun.mp4"), help="Video path")
     parser.add_argument("--audio_dir", type=str, default=os.path.join(musetalk_module_path, "data", "audio"), help="Audio directory path")
     parser.add_argument("--test_mode", type=str, default="realtime", choices=["batch", "realtime"], help="Test mode: batch or realtime")
+    parser.add_argument("--precision", type=str, default="fp16", choices=["fp16", "bf16"], help="UNet/VAE precision")
+    parser.add_argument("--workers", type=int, default=1, help="Batch mode worker processes (>1 shares the GPU)")
 
     args = parser.parse_args()
 
@@ -14,4 +14,10 @@ class AvatarMuseTalkConfig(HandlerBaseConfigModel, BaseModel):
     algo_audio_sample_rate: int = Field(default=16000)  # Internal algorithm sample rate, fixed at 16000, used for input audio resampling
     output_audio_sample_rate: int = Field(default=24000)  # Output audio sample rate (for resampling)
     model_dir: str = Field(default="models/musetalk")  # Root directory for models
-    
\ No newline at end of file
+    compile_models: bool = Field(default=False)  # torch.compile UNet/VAE/PE (slow first warmup, faster steady state)
+    lanczos_resize: bool = Field(default=False)  # Lanczos face crop resize in preparation (needs force_create_avatar)
+    use_trt: bool = Field(default=False)  # Run UNet through a fp16 TensorRT engine (requires torch_tensorrt)
+    whisper_int8: bool = Field(default=False)  # Load Whisper encoder weights as int8 (requires bitsandbytes)
+    gpu_blend: bool = Field(default=False)  # Resize and blend generated faces on GPU (keeps crops and masks in VRAM)
+    vae_slice: int = Field(default=0)  # Max latents per VAE decode call to lower peak VRAM, 0 = decode whole batch
+    precision: str = Field(default="fp16")  # UNet/VAE/PE/Whisper dtype, "fp16" or "bf16" (bf16 needs Ampere or newer)
@@ -2,6 +2,8 @@
 
 import os
 import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict, Optional, cast
 from loguru import logger
 from pydantic import BaseModel, Field
@@ -15,10 +17,20 @@ from chat_engine.data_models.chat_data_type import ChatDataType
 from chat_engine.contexts.session_context import SessionContext
 from chat_engine.data_models.runtime_data.data_bundle import DataBundle, DataBundleDefinition, DataBundleEntry
 from handlers.llm.openai_compatible.chat_history_manager import ChatHistory, HistoryMessage
+import base64
 import json
+import numpy as np
+import orjson
 import requests
 from engine_utils.media_utils import ImageUtils
 
+# 合并输出token的阈值：字符数或等待时间任一达到即发出
+FLUSH_MIN_CHARS = 8
+FLUSH_INTERVAL = 0.03
+
+# 匹配ASR结果中的特殊标记，如 <|zh|><|NEUTRAL|>
+_TOKEN_MARK_RE = re.compile(r"<\|.*?\|>")
+
 class LLMConfig(HandlerBaseConfigModel, BaseModel):
     model_name: str = Field(default="qwen-plus")
     system_prompt: str = Field(default="请你扮演一个 AI 助手，用简短的对话来回答用户的问题，并在对话内容中加入合适的标点符号，不需要加入标点符号相关的内容")
@@ -49,6 +61,13 @@ class LLMContext(HandlerContext):
         self.dify_chat_messages = None
         self.dify_code = None
         self.dify_upload = None
+        # 对话请求复用同一个HTTP会话保持keep-alive连接；图片上传在后台线程中使用各自的会话
+        self.http = requests.Session()
+        # 单线程执行图片上传，每个会话同一时间最多只有一个上传在进行，destroy_context时关闭
+        self.upload_executor = ThreadPoolExecutor(max_workers=1)
+        # 后台上传图片的future，在发送对话请求前取结果；upload_image为提交上传的那一帧
+        self.image_upload_future: Optional[Future] = None
+        self.upload_image = None
 
 
 class HandlerLLM(HandlerBase, ABC):
@@ -102,6 +121,7 @@ class HandlerLLM(HandlerBase, ABC):
         context.dify_chat_messages = handler_config.dify_chat_messages
         context.dify_code = handler_config.dify_code
         context.dify_upload = handler_config.dify_upload
+        context.http.headers['Authorization'] = f'Bearer {context.dify_code}'
         logger.info(f'llm dify_code {context.dify_code}')
 
         context.client = OpenAI(
@@ -131,13 +151,23 @@ class HandlerLLM(HandlerBase, ABC):
             speech_id = context.session_id
         if text is not None:
             context.input_texts += text
+        if context.current_image is not None:
+            # 每轮对话只上传一次：首个文本块时提交上传，与文本累积并行；
+            # 若上传还在排队未开始且有了更新的画面，换成最新一帧，已开始的上传不再重复提交
+            if context.image_upload_future is None or (
+                    context.current_image is not context.upload_image and context.image_upload_future.cancel()):
+                context.upload_image = context.current_image
+                context.image_upload_future = context.upload_executor.submit(
+                    self._upload_image, context.dify_upload, context.dify_code, context.current_image)
 
         text_end = inputs.data.get_meta("human_text_end", False)
         if not text_end:
             return
         chat_text = context.input_texts
-        chat_text = re.sub(r"<\|.*?\|>", "", chat_text)
+        if "<|" in chat_text:
+            chat_text = _TOKEN_MARK_RE.sub("", chat_text)
         if len(chat_text) < 1:
+            self._cancel_image_upload(context)
             return
 
         logger.info(f'llm input {chat_text} ')
@@ -164,61 +194,27 @@ class HandlerLLM(HandlerBase, ABC):
             "files": []
         }
 
-        if context.current_image is not None:
+        if context.image_upload_future is not None:
+            upload_future = context.image_upload_future
+            # 无论后续请求是否成功，这次上传都只用于本轮对话
+            context.image_upload_future = None
+            context.upload_image = None
             try:
-                for image in [context.current_image]:
-                    import base64
-                    if isinstance(image, bytes):
-                        binary_image = image
-                    else:
-                        base64image = ImageUtils.format_image(image)
-                    if isinstance(base64image, str) and base64image.startswith('data:image'):
-                        image_data = base64image.split(',')[1]
-                        binary_image = base64.b64decode(image_data)
-
-                    files = {
-                        'file': ('image.jpg', binary_image, 'image/jpeg')
-                    }
-                    data = {
-                        'user': 'user'
-                    }
-                    upload_url = context.dify_upload
-                    try:
-                        upload_response = requests.post(
-                            upload_url,
-                            headers={
-                                'Authorization': f'Bearer {context.dify_code}'
-                            },
-                            files=files,
-                            data=data,
-                            timeout=(30, 120)  # Add timeout
-                        )
-
-                        if upload_response.status_code in [200, 201]:
-                            file_info = upload_response.json()
-                            request_data["files"].append({
-                                "type": "image",
-                                "transfer_method": "local_file",
-                                "upload_file_id": file_info['id']
-                            })
-                            logger.info(f"upload image. Status code: {upload_response.status_code}")
-                        else:
-                            logger.error(f"Failed to upload image. Status code: {upload_response.status_code}")
-                            logger.error(f"Response: {upload_response.text}")
-                    except requests.exceptions.RequestException as e:
-                        logger.error(f"Error uploading image: {str(e)}")
+                upload_file_id = upload_future.result(timeout=120)
+                if upload_file_id is not None:
+                    request_data["files"].append({
+                        "type": "image",
+                        "transfer_method": "local_file",
+                        "upload_file_id": upload_file_id
+                    })
             except Exception as e:
                 logger.error(f"Unexpected error handling image upload: {str(e)}")
                 # Continue with text-only request if image upload fails
 
         logger.info(f"Sending chat message request with data: {json.dumps(request_data, ensure_ascii=False)}")
         try:
-            response = requests.post(
+            response = context.http.post(
                 context.dify_chat_messages,
-                headers={
-                    'Authorization': f'Bearer {context.dify_code}',
-                    'Content-Type': 'application/json'
-                },
                 json=request_data,
                 stream=True
             )
@@ -245,37 +241,48 @@ class HandlerLLM(HandlerBase, ABC):
         #         output.add_meta("speech_id", speech_id)
         #         yield output
 
+        # 流式输出的合并缓冲，短token攒够一定长度或时间后再发出一个DataBundle；
+        # 缓冲只属于本次生成器，被中断时未发出的文本不会带到下一轮
+        pending_texts = []
+        pending_len = 0
+        last_flush_time = time.monotonic()
         for line in response.iter_lines():
             if line:
                 try:
-                    line_str = line.decode('utf-8')
-                    if line_str.startswith('data: '):
-                        line_str = line_str[6:]
+                    # orjson parses the raw bytes, no per-line utf-8 decode needed
+                    if line.startswith(b'data: '):
+                        line = line[6:]
 
-                    json_response = json.loads(line_str)
+                    json_response = orjson.loads(line)
 
                     if json_response.get('event') == 'message':
                         output_text = json_response.get('answer', '')
                         if output_text:
                             context.output_texts += output_text
-                            logger.info(f"Received message: {output_text}")
-                            output = DataBundle(output_definition)
-                            output.set_main_data(output_text)
-                            output.add_meta("avatar_text_end", False)
-                            output.add_meta("speech_id", speech_id)
-                            yield output
+                            logger.debug("Received message: {}", output_text)
+                            pending_texts.append(output_text)
+                            pending_len += len(output_text)
+                            if pending_len >= FLUSH_MIN_CHARS or time.monotonic() - last_flush_time > FLUSH_INTERVAL:
+                                yield self._flush_pending(pending_texts, output_definition, speech_id)
+                                pending_len = 0
+                                last_flush_time = time.monotonic()
                     elif json_response.get('event') == 'message_end':
                         logger.info("Message stream ended")
+                        if pending_texts:
+                            yield self._flush_pending(pending_texts, output_definition, speech_id)
+                            pending_len = 0
                         context.conversation_id = json_response.get('conversation_id')
                         if 'metadata' in json_response:
                             logger.info(f"Message metadata: {json_response['metadata']}")
-                except json.JSONDecodeError as e:
+                except orjson.JSONDecodeError as e:
                     logger.error(f"Failed to parse JSON: {e}")
                     continue
                 except Exception as e:
                     logger.error(f"Error processing message: {e}")
                     continue
 
+        if pending_texts:
+            yield self._flush_pending(pending_texts, output_definition, speech_id)
         context.history.add_message(HistoryMessage(role="avatar", content=context.output_texts))
         context.output_texts = ''
         logger.info('avatar text end')
@@ -286,6 +293,63 @@ class HandlerLLM(HandlerBase, ABC):
         end_output.add_meta("speech_id", speech_id)
         yield end_output
 
+    @staticmethod
+    def _cancel_image_upload(context: LLMContext):
+        if context.image_upload_future is not None:
+            # 已经开始的上传无法取消，其结果直接丢弃
+            context.image_upload_future.cancel()
+        context.image_upload_future = None
+        context.upload_image = None
+
+    @staticmethod
+    def _flush_pending(pending_texts: list, output_definition, speech_id) -> DataBundle:
+        output = DataBundle(output_definition)
+        output.set_main_data("".join(pending_texts))
+        output.add_meta("avatar_text_end", False)
+        output.add_meta("speech_id", speech_id)
+        pending_texts.clear()
+        return output
+
+    @staticmethod
+    def _upload_image(upload_url: str, dify_code: str, image) -> Optional[str]:
+        if isinstance(image, (bytes, bytearray)):
+            binary_image = image
+        elif isinstance(image, np.ndarray):
+            # 直接编码为JPEG二进制，避免 Base64 编码再解码
+            binary_image = ImageUtils.encode_jpeg_bytes(image)
+        else:
+            binary_image = base64.b64decode(image.split(',')[1])
+
+        files = {
+            'file': ('image.jpg', binary_image, 'image/jpeg')
+        }
+        data = {
+            'user': 'user'
+        }
+        try:
+            # 上传在后台线程运行，不与对话请求共用线程不安全的requests.Session
+            with requests.Session() as http:
+                upload_response = http.post(
+                    upload_url,
+                    headers={'Authorization': f'Bearer {dify_code}'},
+                    files=files,
+                    data=data,
+                    timeout=(30, 120)  # Add timeout
+                )
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error uploading image: {str(e)}")
+            return None
+
+        if upload_response.status_code in [200, 201]:
+            logger.info(f"upload image. Status code: {upload_response.status_code}")
+            return upload_response.json()['id']
+        logger.error(f"Failed to upload image. Status code: {upload_response.status_code}")
+        logger.error(f"Response: {upload_response.text}")
+        return None
+
     def destroy_context(self, context: HandlerContext):
-        pass
+        if isinstance(context, LLMContext):
+            self._cancel_image_upload(context)
+            context.upload_executor.shutdown(wait=False, cancel_futures=True)
+            context.http.close()
 
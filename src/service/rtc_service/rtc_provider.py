@@ -1,74 +1,141 @@
-from typing import Dict, Union
+import sys
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple, Type, Union
 
-import pydantic
+import orjson
 from loguru import logger
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
 
 from engine_utils.singleton import SingletonMeta
-from service.rtc_service.turn_providers.twilio_service import TwilioTurnProvider
+from service.rtc_service.base_turn_provider import BaseRtcTurnEntity, BaseRtcTurnProvider
 from service.service_data_models.service_config_data import ServiceConfigData
 from service.rtc_service.turn_providers.turn_service import TurnServerProvider
 
+class RtcConfig(BaseModel):
+    # 只读配置，单例实例可以安全共享
+    model_config = ConfigDict(frozen=True, extra="forbid", revalidate_instances="never")
+
+    urls: tuple[str, ...]
+    username: str
+    credential: str
+
+
+_URLS = (sys.intern("turn:120.224.27.114:3478"), sys.intern("turns:120.224.27.114:5349"))
+
+# 固定的TURN配置，导入时构建一次，值为常量无需校验
+_DEFAULT_TURN_CONFIG = RtcConfig.model_construct(
+    urls=_URLS,
+    username="admin",
+    credential="admin@123~"
+)
+
+
+def _fast_repr(obj) -> str:
+    # 用orjson序列化pydantic模型，比逐字段的__repr__快
+    if isinstance(obj, BaseModel):
+        return orjson.dumps(obj.model_dump(), default=str).decode()
+    return repr(obj)
+
+
+def _create_twilio_provider() -> BaseRtcTurnProvider:
+    # twilio模块及其SDK只在真正使用twilio时才导入
+    from service.rtc_service.turn_providers.twilio_service import TwilioTurnProvider
+    return TwilioTurnProvider()
+
+
+@lru_cache(maxsize=16)
+def _adapter_for(model_cls: Type[BaseModel]) -> TypeAdapter:
+    # TypeAdapter构建core schema开销较大，每个模型类只构建一次
+    return TypeAdapter(model_cls)
+
+
 class RTCProvider(metaclass=SingletonMeta):
+    __slots__ = ("_factories", "_instances", "_config_models", "_turn_entities")
+
     def __init__(self):
-        self.rtc_turn_providers = {
-            "twilio": TwilioTurnProvider(),
-            "turn": TurnServerProvider()
+        # provider只在第一次使用时创建
+        self._factories: Dict[str, Callable[[], BaseRtcTurnProvider]] = {
+            "twilio": _create_twilio_provider,
+            "turn": TurnServerProvider
         }
+        self._instances: Dict[str, BaseRtcTurnProvider] = {}
+        # 每个provider的配置模型只取一次
+        self._config_models: Dict[str, Type[BaseModel]] = {}
+        # 配置不变时复用生成的turn_entity
+        self._turn_entities: Dict[Tuple[str, BaseModel], BaseRtcTurnEntity] = {}
+
+    def _get_provider(self, name: str) -> Union[BaseRtcTurnProvider, None]:
+        provider = self._instances.get(name)
+        if provider is None:
+            factory = self._factories.get(name)
+            if factory is None:
+                return None
+            provider = factory()
+            self._instances[name] = provider
+        return provider
+
+    def _get_config_model(self, name: str) -> Type[BaseModel]:
+        config_model = self._config_models.get(name)
+        if config_model is None:
+            config_model = self._get_provider(name).get_config_model()
+            self._config_models[name] = config_model
+        return config_model
+
+    def _prepare_turn_entity(self, provider_name: str, provider: BaseRtcTurnProvider,
+                             provider_config: BaseModel) -> BaseRtcTurnEntity:
+        key = (provider_name, provider_config)
+        try:
+            turn_entity = self._turn_entities.get(key)
+        except TypeError:
+            # 非frozen的配置不可哈希（如twilio，token有有效期），每次重新生成
+            return provider.prepare_rtc_configuration(provider_config)
+        if turn_entity is None:
+            turn_entity = provider.prepare_rtc_configuration(provider_config)
+            self._turn_entities[key] = turn_entity
+        return turn_entity
+
+    def _resolve_provider(self, rtc_config) -> Tuple[Optional[str], Optional[BaseRtcTurnProvider], Optional[BaseModel]]:
+        turn_provider_name = "turn"
+        logger.opt(lazy=True).debug("turn_provider_name: {}", lambda: turn_provider_name)
+        turn_provider = self._get_provider(turn_provider_name)
+        if turn_provider is not None:
+            #turn_provider_config = config_model.model_validate(config)
+            turn_provider_config = _DEFAULT_TURN_CONFIG
+            logger.opt(lazy=True).debug("turn_provider_config: {}", lambda: _fast_repr(turn_provider_config))
+            return turn_provider_name, turn_provider, turn_provider_config
+        logger.warning(f"Turn provider {turn_provider_name} is not supported.")
+
+        for provider_name in self._factories:
+            try:
+                turn_provider_config = _adapter_for(self._get_config_model(provider_name)).validate_python(rtc_config)
+            except ValidationError:
+                continue
+            return provider_name, self._get_provider(provider_name), turn_provider_config
+        return None, None, None
 
     def prepare_rtc_configuration(self, config: Union[ServiceConfigData, BaseModel, Dict]):
         turn_entity = None
-        logger.info(f"Parsing config: {config}")
-        if isinstance(config, ServiceConfigData):
-            rtc_config = config.rtc_config
-        elif isinstance(config, BaseModel):
-            rtc_config = config.model_dump()
-        elif isinstance(config, Dict):
-            rtc_config = config
-        else:
-            rtc_config = None
+        logger.opt(lazy=True).debug("Parsing config: {}", lambda: _fast_repr(config))
+        # 客户端handler最先传入的是turn_config字典，放在最前面判断
+        match config:
+            case dict():
+                rtc_config = config
+            case ServiceConfigData():
+                rtc_config = config.rtc_config
+            case BaseModel() if hasattr(config, "rtc_config"):
+                # 直接读取字段，只有没有rtc_config字段时才序列化整个模型
+                rtc_config = config.rtc_config
+            case BaseModel():
+                rtc_config = config.model_dump(exclude_unset=True, mode="python")
+            case _:
+                rtc_config = None
         if rtc_config is not None:
-            logger.info(f"Parsing RTC config: {rtc_config}")
-            turn_provider_name = "turn"
-            turn_provider = None
-            turn_provider_config = None
-            logger.info(f"turn_provider_name: {turn_provider_name}")
-            if turn_provider_name is not None:
-                turn_provider = self.rtc_turn_providers.get(turn_provider_name)
-                if turn_provider is None:
-                    logger.warning(f"Turn provider {turn_provider_name} is not supported.")
-                    turn_provider_name = None
-                else:
-                    config_model = turn_provider.get_config_model()
-                    #turn_provider_config = config_model.model_validate(config)
-                    turn_provider_config = RtcConfig(
-                        #urls=["turn:turn.120-224-27-114.turnserver:3478", "turns:turn.120-224-27-114.turnserver:5349"],
-                        urls=["turn:120.224.27.114:3478", "turns:120.224.27.114:5349"],
-                        username="admin",
-                        credential="admin@123~"
-                    )
-                    logger.info(f"turn_provider_config: {turn_provider_config}")
-            if turn_provider is None:
-                for provider_name, provider in self.rtc_turn_providers.items():
-                    config_model = provider.get_config_model()
-                    logger.info(f"config_model: {config_model}")
-                    try:
-                        logger.info(f"turn_provider_config: {turn_provider_config}")
-                    except pydantic.ValidationError:
-                        continue
-                    else:
-                        turn_provider_name = provider_name
-                        turn_provider = provider
-                        break
+            logger.opt(lazy=True).debug("Parsing RTC config: {}", lambda: rtc_config)
+            turn_provider_name, turn_provider, turn_provider_config = self._resolve_provider(rtc_config)
             if turn_provider is not None:
                 logger.info(f"Use {turn_provider_name} as rtc turn provider.")
-                turn_entity = turn_provider.prepare_rtc_configuration(turn_provider_config)
+                turn_entity = self._prepare_turn_entity(turn_provider_name, turn_provider, turn_provider_config)
         if turn_entity is None:
             logger.info("No valid123 rtc provider configuration found, STUN/TURN will not be valid. "
                         "Communication across networks may not be established.")
         return turn_entity
-
-class RtcConfig(BaseModel):
-    urls: list[str]
-    username: str
-    credential: str
\ No newline at end of file
@@ -0,0 +1,32 @@
+import io
+
+import yaml
+from dynaconf.loaders.base import BaseLoader
+
+try:
+    from yaml import CSafeLoader as YamlSafeLoader
+except ImportError:
+    from yaml import SafeLoader as YamlSafeLoader
+
+YAML_EXTENSIONS = (".yaml", ".yml")
+
+
+def read_yaml(stream):
+    return yaml.load(stream, Loader=YamlSafeLoader)
+
+
+def load(obj, env=None, silent=True, key=None, filename=None, validate=False):
+    """
+    Dynaconf loader for yaml settings files, parsed by libyaml when it is available
+    instead of the pure python ruamel parser vendored in dynaconf.
+    """
+    loader = BaseLoader(
+        obj=obj,
+        env=env,
+        identifier="yaml",
+        extensions=YAML_EXTENSIONS,
+        file_reader=read_yaml,
+        string_reader=lambda data: read_yaml(io.StringIO(data)),
+        validate=validate,
+    )
+    loader.load(filename=filename, key=key, silent=silent)
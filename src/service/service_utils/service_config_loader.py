@@ -1,6 +1,8 @@
 import os
+from typing import Dict, Tuple
 
 from dynaconf import Dynaconf
+from dynaconf.utils.files import find_file
 from loguru import logger
 
 from chat_engine.data_models.chat_engine_config_data import ChatEngineConfigModel
@@ -8,6 +10,20 @@ from engine_utils.directory_info import DirectoryInfo
 from service.service_data_models.logger_config_data import LoggerConfigData
 from service.service_data_models.service_config_data import ServiceConfigData
 
+# [(config_path, mtime, env, dotenv_mtime, dynaconf_env_vars), (logger_config, service_config, engine_config)]
+_CONFIG_CACHE: Dict[Tuple, Tuple[LoggerConfigData, ServiceConfigData, ChatEngineConfigModel]] = {}
+
+
+def _config_cache_key(config_path: str, env: str) -> Tuple:
+    # dynaconf also reads .env and DYNACONF_ prefixed environment variables, changes to either invalidate the cache
+    dotenv_path = find_file(".env")
+    dotenv_mtime = os.path.getmtime(dotenv_path) if dotenv_path and os.path.isfile(dotenv_path) else None
+    env_vars = tuple(sorted(
+        (key, value) for key, value in os.environ.items()
+        if key.startswith("DYNACONF_") or key.endswith("_FOR_DYNACONF")
+    ))
+    return os.path.abspath(config_path), os.path.getmtime(config_path), env, dotenv_mtime, env_vars
+
 
 def load_configs(in_args):
     os.environ["ENV_FOR_DYNACONF"] = in_args.env
@@ -20,15 +36,30 @@ def load_configs(in_args):
         logger.error(f"Config file {config_path} not found!")
         exit(1)
 
-    logger.info(f"Load config with env {in_args.env} from {config_path}")
-    config = Dynaconf(
-        settings_files=[config_path],
-        environments=True,
-        load_dotenv=True
-    )
+    cache_key = _config_cache_key(config_path, in_args.env)
+    cached_configs = _CONFIG_CACHE.get(cache_key)
+    if cached_configs is None:
+        logger.info(f"Load config with env {in_args.env} from {config_path}")
+        config = Dynaconf(
+            settings_files=[config_path],
+            environments=True,
+            load_dotenv=True,
+            # yaml files are read by our libyaml based loader, the builtin yaml core loader is disabled
+            core_loaders=["TOML", "JSON", "INI", "PY"],
+            loaders=["service.service_utils.dynaconf_yaml_loader", "dynaconf.loaders.env_loader"],
+        )
 
-    out_logger_config = LoggerConfigData.model_validate(config.get("logger", {}))
-    out_service_config = ServiceConfigData.model_validate(config.get("service", {}))
-    out_engine_config = ChatEngineConfigModel.model_validate(config.get("chat_engine", {}))
-    return out_logger_config, out_service_config, out_engine_config
+        cached_configs = (
+            LoggerConfigData.model_validate(config.get("logger", {})),
+            ServiceConfigData.model_validate(config.get("service", {})),
+            ChatEngineConfigModel.model_validate(config.get("chat_engine", {})),
+        )
+        _CONFIG_CACHE[cache_key] = cached_configs
+        # loading .env may export DYNACONF_ variables into os.environ, also cache under the resulting key
+        _CONFIG_CACHE[_config_cache_key(config_path, in_args.env)] = cached_configs
 
+    # callers update host/port and model_root in place, so hand out copies of the cached models
+    out_logger_config, out_service_config, out_engine_config = (
+        item.model_copy(deep=True) for item in cached_configs
+    )
+    return out_logger_config, out_service_config, out_engine_config
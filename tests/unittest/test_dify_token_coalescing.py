@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+
+import orjson
+from chat_engine.common.handler_base import HandlerDataInfo
+from chat_engine.data_models.chat_data_type import ChatDataType
+from chat_engine.data_models.runtime_data.data_bundle import DataBundleDefinition, DataBundleEntry
+from handlers.llm.openai_compatible import llm_handler_dify_compatible
+from handlers.llm.openai_compatible.llm_handler_dify_compatible import HandlerLLM, LLMContext
+
+
+def _sse_lines(answers, message_end=True):
+    lines = [b"data: " + orjson.dumps({"event": "message", "answer": answer}) for answer in answers]
+    if message_end:
+        lines.append(b"data: " + orjson.dumps({"event": "message_end", "conversation_id": "conv"}))
+    return lines
+
+
+class TestDifyTokenCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.handler = HandlerLLM()
+        self.context = LLMContext("session")
+        self.context.http = mock.MagicMock()
+        definition = DataBundleDefinition()
+        definition.add_entry(DataBundleEntry.create_text_entry("avatar_text"))
+        self.output_definitions = {
+            ChatDataType.AVATAR_TEXT: HandlerDataInfo(type=ChatDataType.AVATAR_TEXT, definition=definition),
+        }
+
+    def tearDown(self):
+        self.handler.destroy_context(self.context)
+
+    def _run_turn(self, lines, max_outputs=None):
+        response = mock.MagicMock(status_code=200)
+        response.iter_lines.return_value = iter(lines)
+        self.context.http.post.return_value = response
+        inputs = mock.MagicMock()
+        inputs.type = ChatDataType.HUMAN_TEXT
+        inputs.data.get_main_data.return_value = "hello"
+        inputs.data.get_meta.side_effect = lambda name, default=None: {
+            "speech_id": "speech", "human_text_end": True}.get(name, default)
+        generator = self.handler.handle(self.context, inputs, self.output_definitions)
+        outputs = []
+        for output in generator:
+            outputs.append((output.get_main_data(), output.get_meta("avatar_text_end")))
+            if max_outputs is not None and len(outputs) >= max_outputs:
+                generator.close()
+                break
+        return outputs
+
+    @mock.patch.object(llm_handler_dify_compatible, "time")
+    def test_flush_on_min_chars(self, mock_time):
+        mock_time.monotonic.return_value = 0.0
+        outputs = self._run_turn(_sse_lines(["ab", "cd", "efgh", "ij"]))
+        self.assertEqual(outputs, [("abcdefgh", False), ("ij", False), ("", True)])
+
+    @mock.patch.object(llm_handler_dify_compatible, "time")
+    def test_flush_on_interval(self, mock_time):
+        # every clock read is two flush intervals after the previous one
+        mock_time.monotonic.side_effect = (i * llm_handler_dify_compatible.FLUSH_INTERVAL * 2 for i in range(100))
+        outputs = self._run_turn(_sse_lines(["a", "b", "c"]))
+        self.assertEqual(outputs, [("a", False), ("b", False), ("c", False), ("", True)])
+
+    @mock.patch.object(llm_handler_dify_compatible, "time")
+    def test_flush_without_message_end(self, mock_time):
+        mock_time.monotonic.return_value = 0.0
+        outputs = self._run_turn(_sse_lines(["abc"], message_end=False))
+        self.assertEqual(outputs, [("abc", False), ("", True)])
+
+    @mock.patch.object(llm_handler_dify_compatible, "time")
+    def test_abandoned_turn_does_not_leak(self, mock_time):
+        mock_time.monotonic.return_value = 0.0
+        outputs = self._run_turn(_sse_lines(["abcdefgh", "ij", "kl"], message_end=False), max_outputs=1)
+        self.assertEqual(outputs, [("abcdefgh", False)])
+        outputs = self._run_turn(_sse_lines(["xy"]))
+        self.assertEqual(outputs, [("xy", False), ("", True)])
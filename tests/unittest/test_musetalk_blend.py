@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+from handlers.avatar.musetalk.avatar_musetalk_algo import MuseAvatarV15
+from musetalk.utils.blending import get_image_blending
+
+
+def _make_avatar(frame, bbox, crop_box, mask):
+    # _blend_into only reads the per-frame cycle lists, no models are needed
+    avatar = MuseAvatarV15.__new__(MuseAvatarV15)
+    avatar.frame_list_cycle = [frame]
+    avatar.coord_list_cycle = [bbox]
+    avatar.mask_coords_list_cycle = [crop_box]
+    avatar.mask_list_cycle = [mask]
+    return avatar
+
+
+class TestMuseTalkBlend(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def _random_inputs(self, frame_shape, bbox, crop_box):
+        x1, y1, x2, y2 = bbox
+        x_s, y_s, x_e, y_e = crop_box
+        frame = self.rng.integers(0, 256, frame_shape, dtype=np.uint8)
+        face = self.rng.integers(0, 256, (y2 - y1, x2 - x1, 3), dtype=np.uint8)
+        mask = self.rng.integers(0, 256, (y_e - y_s, x_e - x_s), dtype=np.uint8)
+        return frame, face, mask
+
+    def _check_against_pil(self, frame_shape, bbox, crop_box):
+        frame, face, mask = self._random_inputs(frame_shape, bbox, crop_box)
+        frame_before = frame.copy()
+        out = np.empty_like(frame)
+        _make_avatar(frame, bbox, crop_box, mask)._blend_into(out, face, 0)
+        expected = get_image_blending(frame, face, bbox, mask, crop_box)
+        self.assertTrue(np.array_equal(out, expected))
+        # the original frame is reused for every pass over the cycle and must stay untouched
+        self.assertTrue(np.array_equal(frame, frame_before))
+
+    def test_blend_inside_frame(self):
+        self._check_against_pil((96, 80, 3), [20, 30, 50, 64], [10, 22, 60, 72])
+
+    def test_blend_bbox_clipped_by_frame(self):
+        self._check_against_pil((64, 64, 3), [-6, 40, 20, 70], [-14, 30, 28, 80])
+
+    def test_blend_opaque_and_transparent_mask(self):
+        bbox, crop_box = [8, 8, 40, 40], [0, 0, 48, 48]
+        frame, face, _ = self._random_inputs((48, 48, 3), bbox, crop_box)
+        out = np.empty_like(frame)
+
+        _make_avatar(frame, bbox, crop_box, np.zeros((48, 48), dtype=np.uint8))._blend_into(out, face, 0)
+        self.assertTrue(np.array_equal(out, frame))
+
+        _make_avatar(frame, bbox, crop_box, np.full((48, 48), 255, dtype=np.uint8))._blend_into(out, face, 0)
+        expected = frame.copy()
+        expected[8:40, 8:40] = face
+        self.assertTrue(np.array_equal(out, expected))
@@ -0,0 +1,56 @@
+import unittest
+from unittest import mock
+
+from service.rtc_service.rtc_provider import RtcConfig, RTCProvider
+from service.rtc_service.turn_providers.turn_service import TurnServerConfigData, TurnServerProvider
+
+
+def _new_rtc_provider() -> RTCProvider:
+    # bypass the singleton so every test starts with empty caches
+    provider = object.__new__(RTCProvider)
+    RTCProvider.__init__(provider)
+    return provider
+
+
+class TestRtcTurnEntityCache(unittest.TestCase):
+    def setUp(self):
+        self.rtc_provider = _new_rtc_provider()
+        self.turn_provider = TurnServerProvider()
+        self.prepare = mock.patch.object(self.turn_provider, "prepare_rtc_configuration",
+                                         wraps=self.turn_provider.prepare_rtc_configuration)
+        self.prepare_mock = self.prepare.start()
+
+    def tearDown(self):
+        self.prepare.stop()
+
+    def test_frozen_config_is_cached(self):
+        config = RtcConfig(urls=("turn:127.0.0.1:3478",), username="user", credential="pass")
+        first = self.rtc_provider._prepare_turn_entity("turn", self.turn_provider, config)
+        second = self.rtc_provider._prepare_turn_entity(
+            "turn", self.turn_provider, RtcConfig(urls=("turn:127.0.0.1:3478",), username="user", credential="pass"))
+        self.assertIs(first, second)
+        self.assertEqual(self.prepare_mock.call_count, 1)
+
+    def test_changed_config_is_a_miss(self):
+        first = self.rtc_provider._prepare_turn_entity(
+            "turn", self.turn_provider, RtcConfig(urls=("turn:127.0.0.1:3478",), username="user", credential="a"))
+        second = self.rtc_provider._prepare_turn_entity(
+            "turn", self.turn_provider, RtcConfig(urls=("turn:127.0.0.1:3478",), username="user", credential="b"))
+        self.assertIsNot(first, second)
+        self.assertEqual(second.rtc_configuration["iceServers"][0]["credential"], "b")
+        self.assertEqual(self.prepare_mock.call_count, 2)
+
+    def test_unhashable_config_is_not_cached(self):
+        config = TurnServerConfigData(urls=["turn:127.0.0.1:3478"], username="user", credential="pass")
+        first = self.rtc_provider._prepare_turn_entity("turn", self.turn_provider, config)
+        second = self.rtc_provider._prepare_turn_entity("turn", self.turn_provider, config)
+        self.assertIsNot(first, second)
+        self.assertEqual(self.prepare_mock.call_count, 2)
+        self.assertEqual(len(self.rtc_provider._turn_entities), 0)
+
+    def test_prepare_rtc_configuration_reuses_entity(self):
+        rtc_config = {"urls": ["turn:127.0.0.1:3478"], "username": "user", "credential": "pass"}
+        first = self.rtc_provider.prepare_rtc_configuration(rtc_config)
+        second = self.rtc_provider.prepare_rtc_configuration(rtc_config)
+        self.assertIsNotNone(first)
+        self.assertIs(first, second)
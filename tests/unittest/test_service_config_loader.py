@@ -0,0 +1,68 @@
+import argparse
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from service.service_utils import service_config_loader
+from service.service_utils.service_config_loader import load_configs
+
+_CONFIG_YAML = """
+default:
+  service:
+    host: "127.0.0.1"
+    port: 8282
+  chat_engine:
+    model_root: "models"
+"""
+
+
+class TestServiceConfigLoader(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.temp_dir, "config.yaml")
+        with open(self.config_path, "w") as f:
+            f.write(_CONFIG_YAML)
+        self.args = argparse.Namespace(config=self.config_path, env="default")
+        service_config_loader._CONFIG_CACHE.clear()
+        self.dynaconf = mock.patch.object(service_config_loader, "Dynaconf", wraps=service_config_loader.Dynaconf)
+        self.dynaconf_mock = self.dynaconf.start()
+
+    def tearDown(self):
+        self.dynaconf.stop()
+        service_config_loader._CONFIG_CACHE.clear()
+        shutil.rmtree(self.temp_dir)
+
+    def test_cache_hit(self):
+        first = load_configs(self.args)
+        second = load_configs(self.args)
+        self.assertEqual(self.dynaconf_mock.call_count, 1)
+        self.assertEqual(first[1].port, 8282)
+        self.assertEqual(second[1].port, 8282)
+
+    def test_cache_miss_on_mtime_change(self):
+        load_configs(self.args)
+        with open(self.config_path, "w") as f:
+            f.write(_CONFIG_YAML.replace("8282", "8383"))
+        mtime = os.path.getmtime(self.config_path) + 10
+        os.utime(self.config_path, (mtime, mtime))
+        _, service_config, _ = load_configs(self.args)
+        self.assertEqual(self.dynaconf_mock.call_count, 2)
+        self.assertEqual(service_config.port, 8383)
+
+    def test_cache_miss_on_env_var_change(self):
+        load_configs(self.args)
+        with mock.patch.dict(os.environ, {"DYNACONF_SERVICE__PORT": "8484"}):
+            _, service_config, _ = load_configs(self.args)
+        self.assertEqual(self.dynaconf_mock.call_count, 2)
+        self.assertEqual(service_config.port, 8484)
+
+    def test_deep_copy_isolation(self):
+        _, service_config, engine_config = load_configs(self.args)
+        service_config.host = "0.0.0.0"
+        engine_config.model_root = "/tmp/models"
+        _, service_config, engine_config = load_configs(self.args)
+        self.assertEqual(self.dynaconf_mock.call_count, 1)
+        self.assertEqual(service_config.host, "127.0.0.1")
+        self.assertEqual(engine_config.model_root, "models")